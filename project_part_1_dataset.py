@@ -8,8 +8,8 @@ Introduction:
 
 This script generates simulated student data, including ADHD status,academic marks, and behavioral assessments.
 
-It includes functions to create truncated normal distributions, add label noise, generate student data, and plot the results. The data can be saved to an Excel
-file for further analysis.
+It includes functions to create truncated normal distributions, add label noise, generate student data, and plot the results. The data is saved to a binary
+dataset directory (optionally also to an Excel file) for further analysis.
 
 
 
@@ -32,12 +32,114 @@ file for further analysis.
 •	import seaborn as sns: Importing Seaborn for statistical data visualisation.
 """
 
+import hashlib
+import json
+import math
+import os
 import random
+import shutil
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
 import pandas as pd
 import numpy as np
-from scipy.stats import truncnorm, skew, kurtosis
+from scipy.stats import truncnorm, skew, kurtosis, ks_2samp, mannwhitneyu
 import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 import seaborn as sns
+import joblib
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+"""Column Layout and Distribution Parameters
+
+•	VANDERBILT_SECTIONS: (section, number of questions, score shift for ADHD students) for the parent and teacher scales.
+
+•	ENGLISH_DIFFICULTY_TIERS / MATH_DIFFICULTY_TIERS: (topics, ADHD mean, non-ADHD mean) for each difficulty level.
+
+•	MARKS_STDDEV: Standard deviation used for every marks distribution.
+
+•	The loop and vectorized generators both read these tables, so the two modes always produce the same columns and distributions.
+
+"""
+
+VANDERBILT_SECTIONS = [
+    ("inatt", 9, 1),
+    ("hyper", 9, 1),
+    ("odd", 8, 0),
+    ("cd", 14, 0),
+    ("anx", 7, 0),
+    ("sch_perf", 3, 2),
+    ("soc_func", 3, 2),
+]
+
+ENGLISH_DIFFICULTY_TIERS = [
+    (["Eng_read_comp", "Eng_vocab_dev"], 25, 65),
+    (["Eng_fluency", "Eng_decoding", "Eng_fig_lang", "Eng_read_detail",
+      "Eng_narr_struct"], 35, 75),
+    (["Eng_draw_concl"], 45, 85),
+    (["Eng_read_aloud", "Eng_expr"], 55, 95),
+]
+
+MATH_DIFFICULTY_TIERS = [
+    (["Math_mult_div", "Math_fractions", "Math_decimals"], 25, 65),
+    (["Math_time", "Math_place_val", "Math_measure", "Math_geometry"], 35, 75),
+    (["Math_add_sub", "Math_word_prob"], 45, 85),
+]
+
+MARKS_STDDEV = 20
+
+PARENT_COLUMNS = [f"parent_{section}_q{i + 1}"
+                  for section, num_questions, _ in VANDERBILT_SECTIONS
+                  for i in range(num_questions)]
+TEACHER_COLUMNS = [f"teacher_{section}_q{i + 1}"
+                   for section, num_questions, _ in VANDERBILT_SECTIONS
+                   for i in range(num_questions)]
+ENGLISH_COLUMNS = [topic for topics, _, _ in ENGLISH_DIFFICULTY_TIERS
+                   for topic in topics]
+MATH_COLUMNS = [topic for topics, _, _ in MATH_DIFFICULTY_TIERS
+                for topic in topics]
+STATS_COLUMNS = ["english_mean", "english_std", "english_skew",
+                 "english_kurtosis", "math_mean", "math_std", "math_skew",
+                 "math_kurtosis"]
+STUDENT_COLUMNS = (["student_id", "is_adhd"] + PARENT_COLUMNS +
+                   TEACHER_COLUMNS + ENGLISH_COLUMNS + MATH_COLUMNS +
+                   STATS_COLUMNS)
+
+"""Compact Column Schema
+
+•	Vanderbilt responses only take values 0-5 and marks lie in 10-100, so both are stored as uint8.
+
+•	is_adhd is a bool, student_id a uint32 and the per-student statistics are float32.
+
+•	apply_student_schema casts any DataFrame of student data to this schema; columns not in the schema are left unchanged.
+
+"""
+
+STUDENT_SCHEMA = {
+    "student_id": np.uint32,
+    "is_adhd": np.bool_,
+    **{column: np.uint8 for column in PARENT_COLUMNS + TEACHER_COLUMNS +
+       ENGLISH_COLUMNS + MATH_COLUMNS},
+    **{column: np.float32 for column in STATS_COLUMNS},
+}
+
+def apply_student_schema(df):
+    """
+    Cast student data columns to the compact schema.
+
+    Parameters:
+        df (pd.DataFrame): DataFrame containing student data.
+
+    Returns:
+        pd.DataFrame: DataFrame with compact column dtypes.
+    """
+    return df.astype({column: dtype for column, dtype in STUDENT_SCHEMA.items()
+                      if column in df.columns})
 
 """•	This function returns a truncated normal distribution object.
 
@@ -51,8 +153,17 @@ import seaborn as sns
 
 •	The distribution is truncated to be within the range [low, upp].
 
+•	Distribution objects are memoized in a bounded LRU cache, as the generators only use a handful of parameter sets.
+
 """
 
+TRUNCATED_NORMAL_CACHE_SIZE = 64
+
+@lru_cache(maxsize=TRUNCATED_NORMAL_CACHE_SIZE)
+def _cached_truncated_normal(mean, stddev, low, upp):
+    return truncnorm((low - mean) / stddev, (upp - mean) / stddev,
+                     loc=mean, scale=stddev)
+
 def get_truncated_normal(mean, stddev, low=0, upp=100):
     """
     Create a truncated normal distribution.
@@ -66,8 +177,82 @@ def get_truncated_normal(mean, stddev, low=0, upp=100):
     Returns:
         scipy.stats._distn_infrastructure.rv_frozen: Truncated normal distribution.
     """
-    return truncnorm((low - mean) / stddev, (upp - mean) / stddev,
-                     loc=mean, scale=stddev)
+    return _cached_truncated_normal(float(mean), float(stddev), float(low),
+                                    float(upp))
+
+"""Fast Bulk Sampling with Inverse-CDF Lookup Tables
+
+•	get_inverse_cdf_table evaluates the quantile function of a truncated normal on a uniform grid once and caches the table.
+
+•	sample_truncated_normal draws from the cached distribution, or, with use_table=True, maps uniform draws through the table with linear interpolation, which skips scipy's per-call overhead.
+
+•	Draws falling in the outermost table cells (about 0.1% of draws) use the exact quantile function; elsewhere the interpolation error is below 0.01, well under the rounding applied to marks and responses.
+
+"""
+
+INVERSE_CDF_TABLE_SIZE = 16385
+INVERSE_CDF_EXACT_TAIL_CELLS = 8
+
+@lru_cache(maxsize=TRUNCATED_NORMAL_CACHE_SIZE)
+def _cached_inverse_cdf_table(mean, stddev, low, upp, size):
+    table = _cached_truncated_normal(mean, stddev, low, upp).ppf(
+        np.linspace(0.0, 1.0, size))
+    table[0], table[-1] = low, upp
+    table.setflags(write=False)
+    return table
+
+def get_inverse_cdf_table(mean, stddev, low=0, upp=100,
+                          size=INVERSE_CDF_TABLE_SIZE):
+    """
+    Get the quantile function of a truncated normal as a lookup table.
+
+    Parameters:
+        mean (float): Mean of the distribution.
+        stddev (float): Standard deviation of the distribution.
+        low (float): Lower bound of the distribution.
+        upp (float): Upper bound of the distribution.
+        size (int): Number of grid points on [0, 1].
+
+    Returns:
+        np.ndarray: Read-only array of quantiles.
+    """
+    return _cached_inverse_cdf_table(float(mean), float(stddev), float(low),
+                                     float(upp), int(size))
+
+def sample_truncated_normal(mean, stddev, size, rng, low=0, upp=100,
+                            use_table=False):
+    """
+    Draw samples from a truncated normal distribution.
+
+    Parameters:
+        mean (float): Mean of the distribution.
+        stddev (float): Standard deviation of the distribution.
+        size (int or tuple): Output shape.
+        rng (np.random.Generator): Random number generator to draw from.
+        low (float): Lower bound of the distribution.
+        upp (float): Upper bound of the distribution.
+        use_table (bool): Sample through the inverse-CDF lookup table.
+
+    Returns:
+        np.ndarray: Array of samples.
+    """
+    if not use_table:
+        return get_truncated_normal(mean, stddev, low, upp).rvs(
+            size=size, random_state=rng)
+    table = get_inverse_cdf_table(mean, stddev, low, upp)
+    uniform = rng.random(size)
+    position = uniform * (len(table) - 1)
+    index = np.minimum(position.astype(np.intp), len(table) - 2)
+    fraction = position - index
+    samples = table[index] + fraction * (table[index + 1] - table[index])
+
+    # The quantile function is steep in the outer cells, evaluate it exactly
+    tails = ((index < INVERSE_CDF_EXACT_TAIL_CELLS) |
+             (index >= len(table) - 1 - INVERSE_CDF_EXACT_TAIL_CELLS))
+    if tails.any():
+        samples[tails] = get_truncated_normal(mean, stddev, low, upp).ppf(
+            uniform[tails])
+    return samples
 
 """Function to Add Noise To the data
 
@@ -100,6 +285,82 @@ def add_label_noise(data, noise_percentage=0.02):
         data[idx]["is_adhd"] = not data[idx]["is_adhd"]
     return data
 
+"""Vectorized Label Noise over Arrays
+
+•	flip_labels works on a boolean label array instead of a list of dictionaries and returns the flipped indices for auditing.
+
+•	Without flip_rates it flips exactly int(n * noise_percentage) labels chosen uniformly, like add_label_noise.
+
+•	flip_rates gives a separate flip rate per class, e.g. {True: 0.05, False: 0.01} flips 5% of ADHD and 1% of non-ADHD labels.
+
+•	flip_label_chunks applies the noise to a chunk stream. Class totals of a stream are not known in advance, so each label is flipped independently with its class rate.
+
+"""
+
+def flip_labels(labels, noise_percentage=0.02, rng=None, flip_rates=None):
+    """
+    Flip a random subset of boolean labels.
+
+    Parameters:
+        labels (np.ndarray): Boolean labels.
+        noise_percentage (float): Percentage of labels to flip.
+        rng (int or np.random.Generator): Seed or generator.
+        flip_rates (dict): Flip rate per class, overrides noise_percentage.
+
+    Returns:
+        tuple: Flipped copy of the labels and sorted indices of the flips.
+    """
+    rng = np.random.default_rng(rng)
+    labels = np.asarray(labels, dtype=bool)
+    if flip_rates is None:
+        flip_indices = rng.choice(len(labels),
+                                  int(len(labels) * noise_percentage),
+                                  replace=False)
+    else:
+        flip_indices = []
+        for label, rate in flip_rates.items():
+            candidates = np.flatnonzero(labels == label)
+            flip_indices.append(rng.choice(
+                candidates, int(len(candidates) * rate), replace=False))
+        flip_indices = np.concatenate(flip_indices) if flip_indices else \
+            np.empty(0, dtype=np.int64)
+
+    flip_indices = np.sort(flip_indices).astype(np.int64)
+    flipped = labels.copy()
+    flipped[flip_indices] = ~flipped[flip_indices]
+    return flipped, flip_indices
+
+def flip_label_chunks(chunks, noise_percentage=0.02, rng=None,
+                      flip_rates=None, label_column="is_adhd"):
+    """
+    Flip labels in a stream of DataFrame chunks.
+
+    Parameters:
+        chunks (iterable of pd.DataFrame): Chunks of student data.
+        noise_percentage (float): Flip probability for every label.
+        rng (int or np.random.Generator): Seed or generator.
+        flip_rates (dict): Flip probability per class, overrides
+            noise_percentage.
+        label_column (str): Name of the label column.
+
+    Yields:
+        tuple: Chunk with flipped labels and the global row indices of the
+        flips.
+    """
+    rng = np.random.default_rng(rng)
+    if flip_rates is None:
+        flip_rates = {True: noise_percentage, False: noise_percentage}
+    offset = 0
+    for chunk in chunks:
+        labels = chunk[label_column].to_numpy(dtype=bool)
+        rates = np.where(labels, flip_rates.get(True, 0.0),
+                         flip_rates.get(False, 0.0))
+        flip_mask = rng.random(len(labels)) < rates
+        chunk = chunk.copy()
+        chunk[label_column] = labels ^ flip_mask
+        yield chunk, np.flatnonzero(flip_mask) + offset
+        offset += len(labels)
+
 """Function To Generate Student Data
 
 Generates data for num_students students.
@@ -152,7 +413,7 @@ def generate_student_data(num_students, adhd_percentage=0.10,
         data.append(combined_data)
 
     data = add_label_noise(data, noise_percentage)
-    df = pd.DataFrame(data)
+    df = apply_student_schema(pd.DataFrame(data))
     df = df.sample(frac=1).reset_index(drop=True)
     return df
 
@@ -180,35 +441,11 @@ def generate_reading_marks(is_adhd):
         dict: Dictionary of reading marks for different topics.
     """
     marks = {}
-    if is_adhd:
-        high_difficulty_mean, high_difficulty_stddev = 25, 20
-        moderate_difficulty_mean, moderate_difficulty_stddev = 35, 20
-        low_moderate_difficulty_mean, low_moderate_difficulty_stddev = 45, 20
-        low_difficulty_mean, low_difficulty_stddev = 55, 20
-    else:
-        high_difficulty_mean, high_difficulty_stddev = 65, 20
-        moderate_difficulty_mean, moderate_difficulty_stddev = 75, 20
-        low_moderate_difficulty_mean, low_moderate_difficulty_stddev = 85, 20
-        low_difficulty_mean, low_difficulty_stddev = 95, 20
-
-    high_difficulty = ["Eng_read_comp", "Eng_vocab_dev"]
-    moderate_difficulty = ["Eng_fluency", "Eng_decoding", "Eng_fig_lang",
-                           "Eng_read_detail", "Eng_narr_struct"]
-    low_moderate_difficulty = ["Eng_draw_concl"]
-    low_difficulty = ["Eng_read_aloud", "Eng_expr"]
-
-    for topic in high_difficulty:
-        marks[topic] = round(max(10, get_truncated_normal(
-            high_difficulty_mean, high_difficulty_stddev).rvs()))
-    for topic in moderate_difficulty:
-        marks[topic] = round(max(10, get_truncated_normal(
-            moderate_difficulty_mean, moderate_difficulty_stddev).rvs()))
-    for topic in low_moderate_difficulty:
-        marks[topic] = round(max(10, get_truncated_normal(
-            low_moderate_difficulty_mean, low_moderate_difficulty_stddev).rvs()))
-    for topic in low_difficulty:
-        marks[topic] = round(max(10, get_truncated_normal(
-            low_difficulty_mean, low_difficulty_stddev).rvs()))
+    for topics, adhd_mean, non_adhd_mean in ENGLISH_DIFFICULTY_TIERS:
+        mean = adhd_mean if is_adhd else non_adhd_mean
+        for topic in topics:
+            marks[topic] = round(max(10, get_truncated_normal(
+                mean, MARKS_STDDEV).rvs()))
 
     return marks
 
@@ -233,29 +470,11 @@ def generate_math_marks(is_adhd):
         dict: Dictionary of math marks for different topics.
     """
     marks = {}
-    if is_adhd:
-        high_difficulty_mean, high_difficulty_stddev = 25, 20
-        moderate_difficulty_mean, moderate_difficulty_stddev = 35, 20
-        low_difficulty_mean, low_difficulty_stddev = 45, 20
-    else:
-        high_difficulty_mean, high_difficulty_stddev = 65, 20
-        moderate_difficulty_mean, moderate_difficulty_stddev = 75, 20
-        low_difficulty_mean, low_difficulty_stddev = 85, 20
-
-    high_difficulty = ["Math_mult_div", "Math_fractions", "Math_decimals"]
-    moderate_difficulty = ["Math_time", "Math_place_val", "Math_measure",
-                           "Math_geometry"]
-    low_difficulty = ["Math_add_sub", "Math_word_prob"]
-
-    for topic in high_difficulty:
-        marks[topic] = round(max(10, get_truncated_normal(
-            high_difficulty_mean, high_difficulty_stddev).rvs()))
-    for topic in moderate_difficulty:
-        marks[topic] = round(max(10, get_truncated_normal(
-            moderate_difficulty_mean, moderate_difficulty_stddev).rvs()))
-    for topic in low_difficulty:
-        marks[topic] = round(max(10, get_truncated_normal(
-            low_difficulty_mean, low_difficulty_stddev).rvs()))
+    for topics, adhd_mean, non_adhd_mean in MATH_DIFFICULTY_TIERS:
+        mean = adhd_mean if is_adhd else non_adhd_mean
+        for topic in topics:
+            marks[topic] = round(max(10, get_truncated_normal(
+                mean, MARKS_STDDEV).rvs()))
 
     return marks
 
@@ -281,24 +500,10 @@ def generate_vanderbilt_parent_responses(is_adhd):
     """
     responses = {}
     normal_dist = get_truncated_normal(mean=1.5, stddev=0.5, low=0, upp=3)
-    for i in range(9):
-        responses[f"parent_inatt_q{i + 1}"] = round(normal_dist.rvs() +
-                                                    (1 if is_adhd else 0))
-    for i in range(9):
-        responses[f"parent_hyper_q{i + 1}"] = round(normal_dist.rvs() +
-                                                    (1 if is_adhd else 0))
-    for i in range(8):
-        responses[f"parent_odd_q{i + 1}"] = round(normal_dist.rvs())
-    for i in range(14):
-        responses[f"parent_cd_q{i + 1}"] = round(normal_dist.rvs())
-    for i in range(7):
-        responses[f"parent_anx_q{i + 1}"] = round(normal_dist.rvs())
-    for i in range(3):
-        responses[f"parent_sch_perf_q{i + 1}"] = round(normal_dist.rvs() +
-                                                       (2 if is_adhd else 0))
-    for i in range(3):
-        responses[f"parent_soc_func_q{i + 1}"] = round(normal_dist.rvs() +
-                                                       (2 if is_adhd else 0))
+    for section, num_questions, adhd_shift in VANDERBILT_SECTIONS:
+        for i in range(num_questions):
+            responses[f"parent_{section}_q{i + 1}"] = round(
+                normal_dist.rvs() + (adhd_shift if is_adhd else 0))
     return responses
 
 """Function To Generate Vanderbilt Teacher Scale Responses
@@ -322,24 +527,10 @@ def generate_vanderbilt_teacher_responses(is_adhd):
     """
     responses = {}
     normal_dist = get_truncated_normal(mean=1.5, stddev=0.5, low=0, upp=3)
-    for i in range(9):
-        responses[f"teacher_inatt_q{i + 1}"] = round(normal_dist.rvs() +
-                                                     (1 if is_adhd else 0))
-    for i in range(9):
-        responses[f"teacher_hyper_q{i + 1}"] = round(normal_dist.rvs() +
-                                                     (1 if is_adhd else 0))
-    for i in range(8):
-        responses[f"teacher_odd_q{i + 1}"] = round(normal_dist.rvs())
-    for i in range(14):
-        responses[f"teacher_cd_q{i + 1}"] = round(normal_dist.rvs())
-    for i in range(7):
-        responses[f"teacher_anx_q{i + 1}"] = round(normal_dist.rvs())
-    for i in range(3):
-        responses[f"teacher_sch_perf_q{i + 1}"] = round(normal_dist.rvs() +
-                                                        (2 if is_adhd else 0))
-    for i in range(3):
-        responses[f"teacher_soc_func_q{i + 1}"] = round(normal_dist.rvs() +
-                                                        (2 if is_adhd else 0))
+    for section, num_questions, adhd_shift in VANDERBILT_SECTIONS:
+        for i in range(num_questions):
+            responses[f"teacher_{section}_q{i + 1}"] = round(
+                normal_dist.rvs() + (adhd_shift if is_adhd else 0))
     return responses
 
 """Function to Calculate Individual Statistics for English and Math Scores
@@ -376,30 +567,1221 @@ def calculate_individual_stats(reading_marks, math_marks):
     }
     return stats
 
+"""Batched Version of calculate_individual_stats
+
+•	Computes mean, standard deviation, skewness and kurtosis for every row of an (n_students x n_topics) matrix in one pass.
+
+•	Uses the same definitions as np.std, scipy skew and kurtosis with their defaults (population moments, Fisher kurtosis), including NaN for students whose marks are all equal.
+
+•	recompute_individual_stats recomputes the statistics columns of an existing dataset.
+
+•	compare_individual_stats reports the largest relative difference from the per-student function, measured against max(|value|, 1) so statistics near zero are compared absolutely; a NaN on only one side counts as an infinite difference.
+
+•	check_individual_stats raises an AssertionError when any column exceeds the tolerance.
+
+"""
+
+def _row_moments(scores):
+    """
+    Compute mean, standard deviation, skewness and kurtosis per row.
+
+    Parameters:
+        scores (np.ndarray): Matrix of scores, one row per student.
+
+    Returns:
+        tuple: Arrays of mean, standard deviation, skewness and kurtosis.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    mean = scores.mean(axis=1)
+    deviations = scores - mean[:, None]
+    squared = deviations * deviations
+    m2 = squared.mean(axis=1)
+    m3 = (squared * deviations).mean(axis=1)
+    m4 = (squared * squared).mean(axis=1)
+
+    # Same near-constant test as scipy.stats.skew / kurtosis
+    constant = m2 <= (np.finfo(np.float64).resolution * mean) ** 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        skewness = np.where(constant, np.nan, m3 / m2 ** 1.5)
+        kurt = np.where(constant, np.nan, m4 / m2 ** 2 - 3.0)
+    return mean, np.sqrt(m2), skewness, kurt
+
+def calculate_batch_stats(english_scores, math_scores):
+    """
+    Calculate English and Math statistics for many students at once.
+
+    Parameters:
+        english_scores (np.ndarray): English marks, one row per student.
+        math_scores (np.ndarray): Math marks, one row per student.
+
+    Returns:
+        dict: Dictionary mapping statistics column names to arrays.
+    """
+    stats = {}
+    for subject, scores in [("english", english_scores),
+                            ("math", math_scores)]:
+        mean, std, skewness, kurt = _row_moments(scores)
+        stats[f"{subject}_mean"] = mean
+        stats[f"{subject}_std"] = std
+        stats[f"{subject}_skew"] = skewness
+        stats[f"{subject}_kurtosis"] = kurt
+    return stats
+
+def recompute_individual_stats(df):
+    """
+    Recompute the English and Math statistics columns of a dataset.
+
+    Parameters:
+        df (pd.DataFrame): DataFrame containing the marks columns.
+
+    Returns:
+        pd.DataFrame: Statistics columns in the compact schema.
+    """
+    stats = calculate_batch_stats(df[ENGLISH_COLUMNS].to_numpy(),
+                                  df[MATH_COLUMNS].to_numpy())
+    return apply_student_schema(pd.DataFrame(stats, index=df.index))
+
+def compare_individual_stats(df, rtol=1e-9):
+    """
+    Compare batched statistics with calculate_individual_stats row by row.
+
+    Parameters:
+        df (pd.DataFrame): DataFrame containing the marks columns.
+        rtol (float): Largest relative difference that still passes.
+
+    Returns:
+        pd.DataFrame: Largest relative difference and pass flag per
+        statistics column.
+    """
+    per_row = pd.DataFrame(
+        [calculate_individual_stats(dict(zip(ENGLISH_COLUMNS, english)),
+                                    dict(zip(MATH_COLUMNS, math)))
+         for english, math in zip(df[ENGLISH_COLUMNS].to_numpy().tolist(),
+                                  df[MATH_COLUMNS].to_numpy().tolist())],
+        index=df.index)
+    batched = pd.DataFrame(
+        calculate_batch_stats(df[ENGLISH_COLUMNS].to_numpy(),
+                              df[MATH_COLUMNS].to_numpy()), index=df.index)
+    expected = per_row[STATS_COLUMNS].to_numpy(dtype=np.float64)
+    actual = batched[STATS_COLUMNS].to_numpy(dtype=np.float64)
+    with np.errstate(invalid="ignore"):
+        difference = (np.abs(expected - actual)
+                      / np.maximum(np.abs(expected), 1.0))
+    both_nan = np.isnan(expected) & np.isnan(actual)
+    difference = np.where(both_nan, 0.0, difference)
+    difference = np.where(np.isnan(difference), np.inf, difference)
+    max_difference = difference.max(axis=0)
+    return pd.DataFrame({"max_relative_difference": max_difference,
+                         "passed": max_difference <= rtol},
+                        index=STATS_COLUMNS)
+
+def check_individual_stats(df, rtol=1e-9):
+    """
+    Assert that batched statistics match calculate_individual_stats.
+
+    Parameters:
+        df (pd.DataFrame): DataFrame containing the marks columns.
+        rtol (float): Largest relative difference that still passes.
+
+    Returns:
+        pd.DataFrame: Results of compare_individual_stats.
+
+    Raises:
+        AssertionError: If any statistics column exceeds the tolerance.
+    """
+    results = compare_individual_stats(df, rtol)
+    failed = results[~results["passed"]]
+    assert failed.empty, (
+        f"Batched statistics differ by more than {rtol:g}:\n"
+        f"{failed.to_string()}")
+    return results
+
+"""Vectorized Generation Mode
+
+•	Draws whole columns at once for each ADHD group and difficulty tier instead of one value per student.
+
+•	Uses the same distribution tables as the loop generator, so column names and distributions are unchanged.
+
+•	random_state: Seed or numpy Generator, which also makes a run reproducible.
+
+•	generate_feature_columns builds the feature block for a given array of ADHD labels and is reused by the other bulk generators.
+
+"""
+
+def generate_feature_columns(is_adhd, rng, use_inverse_cdf_table=False):
+    """
+    Generate all response, marks and statistics columns for a batch of students.
+
+    Parameters:
+        is_adhd (np.ndarray): Boolean ADHD status for every student.
+        rng (np.random.Generator): Random number generator to draw from.
+        use_inverse_cdf_table (bool): Sample through inverse-CDF tables.
+
+    Returns:
+        dict: Dictionary mapping column names to numpy arrays.
+    """
+    num_students = len(is_adhd)
+    groups = [(True, np.flatnonzero(is_adhd)),
+              (False, np.flatnonzero(~is_adhd))]
+    columns = {}
+
+    for prefix in ["parent", "teacher"]:
+        for section, num_questions, adhd_shift in VANDERBILT_SECTIONS:
+            draws = sample_truncated_normal(
+                1.5, 0.5, (num_students, num_questions), rng, low=0, upp=3,
+                use_table=use_inverse_cdf_table)
+            draws[is_adhd] += adhd_shift
+            responses = np.round(draws).astype(np.uint8)
+            for i in range(num_questions):
+                columns[f"{prefix}_{section}_q{i + 1}"] = responses[:, i]
+
+    for tiers in [ENGLISH_DIFFICULTY_TIERS, MATH_DIFFICULTY_TIERS]:
+        for topics, adhd_mean, non_adhd_mean in tiers:
+            marks = np.empty((num_students, len(topics)), dtype=np.uint8)
+            for group_is_adhd, rows in groups:
+                mean = adhd_mean if group_is_adhd else non_adhd_mean
+                draws = sample_truncated_normal(
+                    mean, MARKS_STDDEV, (len(rows), len(topics)), rng,
+                    use_table=use_inverse_cdf_table)
+                marks[rows] = np.round(np.maximum(10, draws))
+            for i, topic in enumerate(topics):
+                columns[topic] = marks[:, i]
+
+    stats = calculate_batch_stats(
+        np.column_stack([columns[topic] for topic in ENGLISH_COLUMNS]),
+        np.column_stack([columns[topic] for topic in MATH_COLUMNS]))
+    for column in STATS_COLUMNS:
+        columns[column] = stats[column].astype(np.float32)
+    return columns
+
+def generate_student_data_vectorized(num_students, adhd_percentage=0.10,
+                                     noise_percentage=0.02,
+                                     random_state=None,
+                                     use_inverse_cdf_table=False,
+                                     flip_rates=None):
+    """
+    Generate student data with NumPy column draws.
+
+    Parameters:
+        num_students (int): Number of students to generate data for.
+        adhd_percentage (float): Percentage of students with ADHD.
+        noise_percentage (float): Percentage of label noise.
+        random_state (int or np.random.Generator): Seed or generator.
+        use_inverse_cdf_table (bool): Sample through inverse-CDF tables.
+        flip_rates (dict): Label flip rate per class, overrides
+            noise_percentage.
+
+    Returns:
+        pd.DataFrame: DataFrame containing generated student data.
+    """
+    rng = np.random.default_rng(random_state)
+    is_adhd = rng.random(num_students) < adhd_percentage
+    columns = generate_feature_columns(is_adhd, rng, use_inverse_cdf_table)
+
+    labels, _ = flip_labels(is_adhd, noise_percentage, rng, flip_rates)
+
+    columns["student_id"] = np.arange(1, num_students + 1, dtype=np.uint32)
+    columns["is_adhd"] = labels
+    order = rng.permutation(num_students)
+    df = pd.DataFrame({name: columns[name][order]
+                       for name in STUDENT_COLUMNS})
+    return df
+
+"""Streaming Generation in Fixed-Size Chunks
+
+•	Yields one DataFrame per chunk, so only a single chunk is held in memory at a time.
+
+•	Label noise: the exact number of flips for the whole dataset is spread over the chunks with a multivariate hypergeometric draw, which matches picking the flipped students uniformly from the full dataset.
+
+•	Shuffling: rows are shuffled within each chunk only, and student IDs come from a random affine permutation of 1..num_students. This guarantees distinct IDs that are independent of the row contents, but it is not a uniform shuffle of the full DataFrame: an affine map only reaches a small subset of all orderings, and rows never move between chunks.
+
+•	Each chunk is a shard with its own seed spawned from one master SeedSequence, so a run is reproducible and the shards can be generated in a process pool. The output only depends on the master seed and chunk_size, not on the number of workers.
+
+•	save_dataset writes the chunks to disk incrementally.
+
+"""
+
+def _random_id_permutation(num_students, rng):
+    """
+    Draw a random affine permutation i -> (a * i + b) mod num_students.
+
+    Parameters:
+        num_students (int): Number of students.
+        rng (np.random.Generator): Random number generator to draw from.
+
+    Returns:
+        tuple: Multiplier and offset of the permutation.
+    """
+    if num_students <= 1:
+        return 1, 0
+    while True:
+        multiplier = int(rng.integers(1, num_students))
+        if math.gcd(multiplier, num_students) == 1:
+            break
+    offset = int(rng.integers(0, num_students))
+    return multiplier, offset
+
+def _as_seed_sequence(random_state):
+    """
+    Convert a seed, generator or seed sequence into a SeedSequence.
+
+    Parameters:
+        random_state (int, np.random.Generator or np.random.SeedSequence):
+            Master seed.
+
+    Returns:
+        np.random.SeedSequence: Seed sequence to spawn shard seeds from.
+    """
+    if isinstance(random_state, np.random.SeedSequence):
+        return random_state
+    if isinstance(random_state, np.random.Generator):
+        return np.random.SeedSequence(int(random_state.integers(2 ** 63)))
+    return np.random.SeedSequence(random_state)
+
+def plan_shards(num_students, chunk_size=100000, noise_percentage=0.02,
+                random_state=None):
+    """
+    Split a generation run into shards with their own seeds.
+
+    Parameters:
+        num_students (int): Number of students to generate data for.
+        chunk_size (int): Maximum number of students per shard.
+        noise_percentage (float): Percentage of label noise.
+        random_state (int or np.random.SeedSequence): Master seed.
+
+    Returns:
+        list of dict: Start row, size, number of label flips, seed sequence
+        and student ID permutation for every shard.
+    """
+    chunk_starts = list(range(0, num_students, chunk_size))
+    chunk_sizes = [min(chunk_size, num_students - start)
+                   for start in chunk_starts]
+    plan_seed, *shard_seeds = _as_seed_sequence(random_state).spawn(
+        1 + len(chunk_starts))
+    plan_rng = np.random.default_rng(plan_seed)
+
+    num_flips = int(num_students * noise_percentage)
+    chunk_flips = (plan_rng.multivariate_hypergeometric(chunk_sizes, num_flips)
+                   if chunk_sizes else [])
+    multiplier, offset = _random_id_permutation(num_students, plan_rng)
+
+    return [{"start": start, "size": size, "flips": int(flips),
+             "seed": seed, "num_students": num_students,
+             "id_multiplier": multiplier, "id_offset": offset}
+            for start, size, flips, seed in zip(chunk_starts, chunk_sizes,
+                                                chunk_flips, shard_seeds)]
+
+def generate_shard(shard, adhd_percentage=0.10, use_inverse_cdf_table=False):
+    """
+    Generate the student data for a single shard.
+
+    Parameters:
+        shard (dict): Shard description produced by plan_shards.
+        adhd_percentage (float): Percentage of students with ADHD.
+        use_inverse_cdf_table (bool): Sample through inverse-CDF tables.
+
+    Returns:
+        pd.DataFrame: DataFrame containing the shard's student data.
+    """
+    rng = np.random.default_rng(shard["seed"])
+    size = shard["size"]
+    is_adhd = rng.random(size) < adhd_percentage
+    columns = generate_feature_columns(is_adhd, rng, use_inverse_cdf_table)
+
+    labels = is_adhd.copy()
+    flip_indices = rng.choice(size, shard["flips"], replace=False)
+    labels[flip_indices] = ~labels[flip_indices]
+
+    positions = np.arange(shard["start"], shard["start"] + size,
+                          dtype=np.int64)
+    columns["student_id"] = ((shard["id_multiplier"] * positions +
+                              shard["id_offset"]) % shard["num_students"] +
+                             1).astype(np.uint32)
+    columns["is_adhd"] = labels
+    order = rng.permutation(size)
+    return pd.DataFrame({name: columns[name][order]
+                         for name in STUDENT_COLUMNS})
+
+def generate_student_data_chunks(num_students, chunk_size=100000,
+                                 adhd_percentage=0.10, noise_percentage=0.02,
+                                 random_state=None, num_workers=1,
+                                 use_inverse_cdf_table=False):
+    """
+    Generate student data as a stream of fixed-size chunks.
+
+    Parameters:
+        num_students (int): Number of students to generate data for.
+        chunk_size (int): Maximum number of students per chunk.
+        adhd_percentage (float): Percentage of students with ADHD.
+        noise_percentage (float): Percentage of label noise.
+        random_state (int or np.random.SeedSequence): Master seed.
+        num_workers (int): Number of worker processes generating shards.
+        use_inverse_cdf_table (bool): Sample through inverse-CDF tables.
+
+    Yields:
+        pd.DataFrame: DataFrame containing one chunk of student data.
+    """
+    shards = plan_shards(num_students, chunk_size, noise_percentage,
+                         random_state)
+    if num_workers <= 1:
+        for shard in shards:
+            yield generate_shard(shard, adhd_percentage,
+                                 use_inverse_cdf_table)
+        return
+
+    # Keep a bounded window of submitted shards so memory stays constant
+    # when the consumer is slower than the workers.
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        pending = deque()
+        shard_iter = iter(shards)
+        for shard in islice(shard_iter, 2 * num_workers):
+            pending.append(executor.submit(generate_shard, shard,
+                                           adhd_percentage,
+                                           use_inverse_cdf_table))
+        while pending:
+            chunk = pending.popleft().result()
+            for shard in islice(shard_iter, 1):
+                pending.append(executor.submit(generate_shard, shard,
+                                               adhd_percentage,
+                                               use_inverse_cdf_table))
+            yield chunk
+
+def generate_student_data_parallel(num_students, adhd_percentage=0.10,
+                                   noise_percentage=0.02, random_state=None,
+                                   num_workers=None, chunk_size=100000,
+                                   use_inverse_cdf_table=False):
+    """
+    Generate student data across a process pool with per-shard seeds.
+
+    Parameters:
+        num_students (int): Number of students to generate data for.
+        adhd_percentage (float): Percentage of students with ADHD.
+        noise_percentage (float): Percentage of label noise.
+        random_state (int or np.random.SeedSequence): Master seed.
+        num_workers (int): Number of worker processes (default: CPU count).
+        chunk_size (int): Number of students per shard.
+        use_inverse_cdf_table (bool): Sample through inverse-CDF tables.
+
+    Returns:
+        pd.DataFrame: DataFrame containing generated student data. The output
+        depends only on the master seed and chunk_size, not on num_workers.
+    """
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    chunks = list(generate_student_data_chunks(
+        num_students, chunk_size, adhd_percentage, noise_percentage,
+        random_state, num_workers, use_inverse_cdf_table))
+    if not chunks:
+        return apply_student_schema(pd.DataFrame(columns=STUDENT_COLUMNS))
+    return pd.concat(chunks, ignore_index=True)
+
+"""Binary Dataset Format
+
+•	A dataset is a directory with one raw little-endian binary file per column (<column>.bin) and a schema.json file listing the column names, dtypes and number of rows.
+
+•	save_dataset accepts a DataFrame or a stream of DataFrame chunks and appends each chunk to the column files, so large datasets are written with bounded memory. schema.json is written last and marks the dataset as complete.
+
+•	open_dataset_columns memory-maps the column files without reading them; load_dataset returns a DataFrame in the compact schema and also reads the old .xlsx/.csv files.
+
+•	Excel is kept only as an optional export (see export_excel in the main block).
+
+•	dataset_content_hash hashes the schema and column files, so caches built from a dataset can tell when it changed.
+
+"""
+
+DATASET_SCHEMA_FILE = "schema.json"
+
+def save_dataset(data, path):
+    """
+    Write student data to a binary column-per-file dataset directory.
+
+    Parameters:
+        data (pd.DataFrame or iterable of pd.DataFrame): Data or data chunks.
+        path (str): Directory to write the dataset to.
+
+    Returns:
+        int: Number of rows written.
+    """
+    if isinstance(data, pd.DataFrame):
+        data = [data]
+    os.makedirs(path, exist_ok=True)
+    schema_path = os.path.join(path, DATASET_SCHEMA_FILE)
+    if os.path.exists(schema_path):
+        os.remove(schema_path)
+
+    columns = None
+    files = {}
+    num_rows = 0
+    try:
+        for chunk in data:
+            if columns is None:
+                columns = [{"name": name, "dtype": chunk[name].dtype.str}
+                           for name in chunk.columns]
+                files = {column["name"]: open(
+                    os.path.join(path, f"{column['name']}.bin"), "wb")
+                    for column in columns}
+            for column in columns:
+                values = np.ascontiguousarray(
+                    chunk[column["name"]].to_numpy(dtype=column["dtype"]))
+                files[column["name"]].write(values.tobytes())
+            num_rows += len(chunk)
+    finally:
+        for f in files.values():
+            f.close()
+
+    with open(schema_path, "w") as f:
+        json.dump({"num_rows": num_rows, "columns": columns or []}, f,
+                  indent=2)
+    return num_rows
+
+def read_dataset_schema(path):
+    """
+    Read the schema of a binary dataset directory.
+
+    Parameters:
+        path (str): Dataset directory.
+
+    Returns:
+        dict: Number of rows and list of column names and dtypes.
+    """
+    with open(os.path.join(path, DATASET_SCHEMA_FILE)) as f:
+        return json.load(f)
+
+def open_dataset_columns(path, columns=None, mmap_mode="r"):
+    """
+    Open the columns of a binary dataset as numpy arrays.
+
+    Parameters:
+        path (str): Dataset directory.
+        columns (list): Columns to open (default is all columns).
+        mmap_mode (str): Memory-map mode, or None to read into memory.
+
+    Returns:
+        dict: Dictionary mapping column names to numpy arrays.
+    """
+    schema = read_dataset_schema(path)
+    dtypes = {column["name"]: np.dtype(column["dtype"])
+              for column in schema["columns"]}
+    if columns is None:
+        columns = list(dtypes)
+    arrays = {}
+    for name in columns:
+        filename = os.path.join(path, f"{name}.bin")
+        if mmap_mode is None or schema["num_rows"] == 0:
+            arrays[name] = np.fromfile(filename, dtype=dtypes[name])
+        else:
+            arrays[name] = np.memmap(filename, dtype=dtypes[name],
+                                     mode=mmap_mode,
+                                     shape=(schema["num_rows"],))
+    return arrays
+
+def load_dataset(path, columns=None):
+    """
+    Load student data from a binary dataset directory or an Excel/CSV file.
+
+    Parameters:
+        path (str): Dataset directory, or path to a .xlsx or .csv file.
+        columns (list): Columns to load (default is all columns).
+
+    Returns:
+        pd.DataFrame: The loaded dataset.
+    """
+    if path.endswith(".xlsx"):
+        df = pd.read_excel(path, usecols=columns)
+    elif path.endswith(".csv"):
+        df = pd.read_csv(path, usecols=columns)
+    else:
+        df = pd.DataFrame(open_dataset_columns(path, columns, mmap_mode=None))
+    return apply_student_schema(df)
+
+def dataset_content_hash(path, block_size=1 << 20):
+    """
+    Hash the content of a binary dataset directory or an Excel/CSV file.
+
+    Parameters:
+        path (str): Dataset directory, or path to a .xlsx or .csv file.
+        block_size (int): Number of bytes read at a time.
+
+    Returns:
+        str: Hexadecimal SHA-256 digest.
+    """
+    if os.path.isdir(path):
+        schema = read_dataset_schema(path)
+        files = [DATASET_SCHEMA_FILE] + [f"{column['name']}.bin"
+                                         for column in schema["columns"]]
+        files = [os.path.join(path, name) for name in files]
+    else:
+        files = [path]
+    digest = hashlib.sha256()
+    for filename in files:
+        digest.update(os.path.basename(filename).encode())
+        with open(filename, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+"""Preprocessing Cache
+
+•	split_and_scale performs the stratified train/test split and fits the StandardScaler on the training rows; parts 2 and 4 both import it from here, next to the dataset format, so part 4 does not pull in the training code.
+
+•	preprocess_dataset caches its results under cache_dir, keyed by a hash of the dataset content and of the split and scaler parameters. A cache entry holds the scaled train/test matrices, labels and row indices as .npy files, the fitted scaler and a meta.json with the parameters and feature names.
+
+•	Cached matrices are returned as memory maps, so repeated experiments skip reading, splitting and scaling the dataset. Entries are written to a temporary directory and renamed, so an interrupted run never leaves a partial entry.
+
+"""
+
+PREPROCESSING_CACHE_VERSION = 1
+PREPROCESSING_ARRAYS = ["X_train", "X_test", "y_train", "y_test",
+                        "train_index", "test_index"]
+
+def split_and_scale(data, test_size=0.2, random_state=42,
+                    label_column="is_adhd"):
+    """
+    Split the data into stratified train/test sets and scale the features.
+
+    Parameters:
+        data (pd.DataFrame): The dataset.
+        test_size (float): Fraction of rows in the test set.
+        random_state (int): Seed of the split.
+        label_column (str): Name of the target column.
+
+    Returns:
+        dict: Scaled X_train and X_test (float32), y_train and y_test,
+        train_index and test_index (row positions), the fitted scaler and
+        the feature_names.
+    """
+    X = data.drop(label_column, axis=1).astype(np.float32)
+    y = data[label_column].to_numpy()
+    train_index, test_index = train_test_split(
+        np.arange(len(data)), test_size=test_size,
+        random_state=random_state, stratify=y)
+
+    scaler = StandardScaler()
+    X_train = scaler.fit_transform(X.iloc[train_index]).astype(np.float32)
+    X_test = scaler.transform(X.iloc[test_index]).astype(np.float32)
+    return {"X_train": X_train, "X_test": X_test,
+            "y_train": y[train_index], "y_test": y[test_index],
+            "train_index": train_index, "test_index": test_index,
+            "scaler": scaler, "feature_names": list(X.columns)}
+
+def preprocess_dataset(path, cache_dir="preprocessing_cache", test_size=0.2,
+                       random_state=42, label_column="is_adhd",
+                       mmap_mode="c"):
+    """
+    Load, split and scale a dataset, reusing cached results when possible.
+
+    Parameters:
+        path (str): Dataset directory, or path to a .xlsx or .csv file.
+        cache_dir (str): Directory holding the cache entries.
+        test_size (float): Fraction of rows in the test set.
+        random_state (int): Seed of the split.
+        label_column (str): Name of the target column.
+        mmap_mode (str): Memory-map mode of the returned arrays; the default
+            copy-on-write mode lets callers modify them without changing
+            the cache.
+
+    Returns:
+        dict: Same keys as split_and_scale, plus the cache_key of the entry.
+    """
+    params = {"version": PREPROCESSING_CACHE_VERSION,
+              "dataset": dataset_content_hash(path),
+              "test_size": test_size, "random_state": random_state,
+              "label_column": label_column, "stratify": True,
+              "scaler": "StandardScaler", "dtype": "float32"}
+    key = hashlib.sha256(
+        json.dumps(params, sort_keys=True).encode()).hexdigest()[:32]
+    entry = os.path.join(cache_dir, key)
+
+    if not os.path.exists(os.path.join(entry, "meta.json")):
+        result = split_and_scale(load_dataset(path), test_size,
+                                 random_state, label_column)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_entry = tempfile.mkdtemp(prefix=f"{key}.", dir=cache_dir)
+        for name in PREPROCESSING_ARRAYS:
+            np.save(os.path.join(tmp_entry, f"{name}.npy"), result[name])
+        joblib.dump(result["scaler"], os.path.join(tmp_entry, "scaler.pkl"))
+        with open(os.path.join(tmp_entry, "meta.json"), "w") as f:
+            json.dump({"params": params,
+                       "feature_names": result["feature_names"]}, f,
+                      indent=2)
+        try:
+            os.rename(tmp_entry, entry)
+        except OSError:
+            # Another run stored the same entry first
+            shutil.rmtree(tmp_entry)
+
+    with open(os.path.join(entry, "meta.json")) as f:
+        meta = json.load(f)
+    result = {name: np.load(os.path.join(entry, f"{name}.npy"),
+                            mmap_mode=mmap_mode)
+              for name in PREPROCESSING_ARRAYS}
+    result["scaler"] = joblib.load(os.path.join(entry, "scaler.pkl"))
+    result["feature_names"] = meta["feature_names"]
+    result["cache_key"] = key
+    return result
+
+"""Noise and Prevalence Parameter Sweeps
+
+•	generate_group_pools draws the expensive feature columns once for a pool of ADHD students and a pool of non-ADHD students. The pools are drawn in fixed-size blocks with their own seeds, so the first rows of a pool do not depend on the pool size.
+
+•	run_noise_prevalence_sweep derives every (adhd_percentage, noise_percentage) scenario from the pools: it draws the number of ADHD students, takes that many leading rows from each pool, flips labels and shuffles. Student IDs are assigned after the shuffle, so they carry no information about the pool a row came from.
+
+•	Scenarios with the same adhd_percentage share their rows and only differ in the flipped labels.
+
+•	Scenario seeds are keyed by the percentages themselves rather than their position in the lists, so a scenario is identical whichever other scenarios are swept with it.
+
+•	Every scenario is saved as a binary dataset under output_dir; scenarios already on disk are reused, and the pools are only generated when at least one scenario is missing. The scenario directory names include SWEEP_VERSION, so scenarios written by an older layout are regenerated.
+
+•	check_student_id_leak asserts that student_id does not predict is_adhd, using a Mann-Whitney U test of the IDs of the two classes (equivalent to testing that the ROC AUC of student_id is 0.5).
+
+"""
+
+def _keyed_seed_sequence(seed_seq, *key):
+    """
+    Derive a child seed sequence identified by a key instead of a position.
+
+    Parameters:
+        seed_seq (np.random.SeedSequence): Parent seed sequence.
+        *key (int): Non-negative integers identifying the child.
+
+    Returns:
+        np.random.SeedSequence: Child seed sequence.
+    """
+    return np.random.SeedSequence(seed_seq.entropy,
+                                  spawn_key=seed_seq.spawn_key + key)
+
+def _percentage_key(percentage):
+    return int(round(percentage * 10 ** 9))
+
+def generate_group_pools(num_adhd, num_non_adhd, seed_seq,
+                         use_inverse_cdf_table=False, block_size=16384):
+    """
+    Generate feature columns for separate pools of ADHD and non-ADHD students.
+
+    Parameters:
+        num_adhd (int): Number of ADHD students in the pool.
+        num_non_adhd (int): Number of non-ADHD students in the pool.
+        seed_seq (np.random.SeedSequence): Seed of the pools; every block
+            of block_size rows is drawn from its own child seed.
+        use_inverse_cdf_table (bool): Sample through inverse-CDF tables.
+        block_size (int): Number of rows drawn per block.
+
+    Returns:
+        dict: Feature columns for the True (ADHD) and False pools.
+    """
+    pools = {}
+    for group, size in [(True, num_adhd), (False, num_non_adhd)]:
+        blocks = [generate_feature_columns(
+                      np.full(block_size, group),
+                      np.random.default_rng(
+                          _keyed_seed_sequence(seed_seq, int(group), block)),
+                      use_inverse_cdf_table)
+                  for block in range(max(1, -(-size // block_size)))]
+        pools[group] = {name: np.concatenate(
+                            [columns[name] for columns in blocks])[:size]
+                        for name in blocks[0]}
+    return pools
+
+# Version 2 assigns student IDs after the shuffle
+SWEEP_VERSION = 2
+
+def _sweep_scenario_path(output_dir, num_students, seed, adhd_percentage,
+                         noise_percentage, use_inverse_cdf_table):
+    sampler = "table" if use_inverse_cdf_table else "exact"
+    return os.path.join(output_dir,
+                        f"students_{num_students}_seed_{seed}_"
+                        f"adhd_{adhd_percentage:g}_noise_{noise_percentage:g}_"
+                        f"{sampler}_v{SWEEP_VERSION}")
+
+def run_noise_prevalence_sweep(num_students, adhd_percentages,
+                               noise_percentages, output_dir,
+                               random_state=None,
+                               use_inverse_cdf_table=False):
+    """
+    Generate a dataset for every ADHD and noise percentage combination.
+
+    Parameters:
+        num_students (int): Number of students in every scenario.
+        adhd_percentages (list): ADHD percentages to sweep over.
+        noise_percentages (list): Label noise percentages to sweep over.
+        output_dir (str): Directory where scenario datasets are cached.
+        random_state (int): Master seed; scenarios are only reused from disk
+            for the same seed.
+        use_inverse_cdf_table (bool): Sample through inverse-CDF tables.
+
+    Returns:
+        dict: Dataset path for every (adhd_percentage, noise_percentage).
+    """
+    seed_seq = _as_seed_sequence(random_state)
+    scenario_seeds = {p: _keyed_seed_sequence(seed_seq, 0, _percentage_key(p))
+                      for p in adhd_percentages}
+    num_adhd = {p: int(np.random.default_rng(
+                    _keyed_seed_sequence(scenario_seeds[p], 0)).binomial(
+                    num_students, p))
+                for p in adhd_percentages}
+
+    paths = {(p, noise): _sweep_scenario_path(output_dir, num_students,
+                                              seed_seq.entropy, p, noise,
+                                              use_inverse_cdf_table)
+             for p in adhd_percentages for noise in noise_percentages}
+    missing = [key for key, path in paths.items() if not os.path.exists(
+        os.path.join(path, DATASET_SCHEMA_FILE))]
+    if not missing:
+        return paths
+
+    pools = generate_group_pools(
+        max(num_adhd[p] for p, _ in missing),
+        max(num_students - num_adhd[p] for p, _ in missing),
+        _keyed_seed_sequence(seed_seq, 1), use_inverse_cdf_table)
+
+    for p in adhd_percentages:
+        noise_levels = [noise for noise in noise_percentages
+                        if (p, noise) in missing]
+        if not noise_levels:
+            continue
+        num_non_adhd = num_students - num_adhd[p]
+        columns = {name: np.concatenate([pools[True][name][:num_adhd[p]],
+                                         pools[False][name][:num_non_adhd]])
+                   for name in pools[True]}
+        is_adhd = np.arange(num_students) < num_adhd[p]
+
+        for noise in noise_levels:
+            noise_rng = np.random.default_rng(_keyed_seed_sequence(
+                scenario_seeds[p], 1, _percentage_key(noise)))
+            columns["is_adhd"], _ = flip_labels(is_adhd, noise, noise_rng)
+            order = noise_rng.permutation(num_students)
+            # IDs follow the shuffled order; numbering the pool rows first
+            # would give every true ADHD student an ID <= num_adhd
+            shuffled = {name: values[order]
+                        for name, values in columns.items()}
+            shuffled["student_id"] = np.arange(1, num_students + 1,
+                                               dtype=np.uint32)
+            df = pd.DataFrame({name: shuffled[name]
+                               for name in STUDENT_COLUMNS})
+            save_dataset(df, paths[(p, noise)])
+    return paths
+
+def check_student_id_leak(df, alpha=0.001):
+    """
+    Assert that student_id does not predict is_adhd.
+
+    Parameters:
+        df (pd.DataFrame): DataFrame with student_id and is_adhd columns.
+        alpha (float): Significance level of the Mann-Whitney U test.
+
+    Returns:
+        float: ROC AUC of student_id as a score for is_adhd.
+
+    Raises:
+        AssertionError: If the IDs of the two classes differ significantly.
+    """
+    labels = df["is_adhd"].to_numpy(dtype=bool)
+    ids = df["student_id"].to_numpy(dtype=np.float64)
+    if labels.all() or not labels.any():
+        return 0.5
+    statistic, pvalue = mannwhitneyu(ids[labels], ids[~labels])
+    auc = statistic / (labels.sum() * (~labels).sum())
+    assert pvalue >= alpha, (
+        f"student_id predicts is_adhd (AUC {auc:.3f}, p = {pvalue:.2e})")
+    return auc
+
+"""Parity Check and Benchmark for the Generation Modes
+
+•	compare_generation_modes runs a two-sample Kolmogorov-Smirnov test on every column, separately for ADHD and non-ADHD students.
+
+•	A test passes when its p-value is at least alpha divided by the number of tests (Bonferroni correction), so the overall false-alarm rate stays below alpha.
+
+•	check_generation_modes raises an AssertionError listing the columns that fail.
+
+•	benchmark_generation times both modes and reports rows per second.
+
+"""
+
+def compare_generation_modes(num_students=2000, adhd_percentage=0.10,
+                             noise_percentage=0.02, random_state=None,
+                             alpha=0.01):
+    """
+    Compare the loop and vectorized generators column by column.
+
+    Parameters:
+        num_students (int): Number of students to generate in each mode.
+        adhd_percentage (float): Percentage of students with ADHD.
+        noise_percentage (float): Percentage of label noise.
+        random_state (int or np.random.Generator): Seed for the vectorized mode.
+        alpha (float): Overall significance level across all tests.
+
+    Returns:
+        pd.DataFrame: KS statistic, p-value and pass flag per column and
+        group.
+    """
+    loop_df = generate_student_data(num_students, adhd_percentage,
+                                    noise_percentage)
+    vectorized_df = generate_student_data_vectorized(
+        num_students, adhd_percentage, noise_percentage, random_state)
+
+    results = []
+    for group in [True, False]:
+        loop_group = loop_df[loop_df['is_adhd'] == group]
+        vectorized_group = vectorized_df[vectorized_df['is_adhd'] == group]
+        for column in STUDENT_COLUMNS[2:]:
+            statistic, pvalue = ks_2samp(loop_group[column].dropna(),
+                                         vectorized_group[column].dropna())
+            results.append({"column": column, "is_adhd": group,
+                            "statistic": statistic, "pvalue": pvalue})
+    results = pd.DataFrame(results)
+    results["passed"] = results["pvalue"] >= alpha / len(results)
+    return results
+
+def check_generation_modes(num_students=2000, adhd_percentage=0.10,
+                           noise_percentage=0.02, random_state=None,
+                           alpha=0.01):
+    """
+    Assert that the loop and vectorized generators match column by column.
+
+    Parameters:
+        num_students (int): Number of students to generate in each mode.
+        adhd_percentage (float): Percentage of students with ADHD.
+        noise_percentage (float): Percentage of label noise.
+        random_state (int or np.random.Generator): Vectorized mode seed.
+        alpha (float): Overall significance level across all tests.
+
+    Returns:
+        pd.DataFrame: Results of compare_generation_modes.
+
+    Raises:
+        AssertionError: If any column differs between the two modes.
+    """
+    results = compare_generation_modes(num_students, adhd_percentage,
+                                       noise_percentage, random_state, alpha)
+    failed = results[~results["passed"]]
+    assert failed.empty, (
+        f"{len(failed)} of {len(results)} columns differ between modes "
+        f"(p < {alpha / len(results):.2e}):\n{failed.to_string()}")
+    return results
+
+def benchmark_generation(num_students=2000, random_state=None):
+    """
+    Measure generation throughput of the loop and vectorized modes.
+
+    Parameters:
+        num_students (int): Number of students to generate in each mode.
+        random_state (int or np.random.Generator): Seed for the vectorized mode.
+
+    Returns:
+        dict: Rows per second for each mode.
+    """
+    start = time.perf_counter()
+    generate_student_data(num_students)
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    generate_student_data_vectorized(num_students, random_state=random_state)
+    vectorized_seconds = time.perf_counter() - start
+
+    results = {"loop": num_students / loop_seconds,
+               "vectorized": num_students / vectorized_seconds}
+    print(f"Loop: {results['loop']:.0f} rows/sec, "
+          f"Vectorized: {results['vectorized']:.0f} rows/sec "
+          f"({results['vectorized'] / results['loop']:.1f}x)")
+    return results
+
+"""Grouped Aggregates for the Plots
+
+•	compute_group_aggregates computes count, mean and variance of every column for ADHD and non-ADHD students in a single groupby pass.
+
+•	The result has one row per (column, statistic) and one column per group (True for ADHD, False for Non-ADHD), e.g. aggregates.loc[("Eng_expr", "mean"), True].
+
+•	The main block computes the aggregates once and passes them to every plot; aggregates computed elsewhere (e.g. from a chunked dataset) can be passed in the same way.
+
+"""
+
+GROUP_AGGREGATE_STATS = ["count", "mean", "var"]
+
+def compute_group_aggregates(df, columns=None):
+    """
+    Compute per-group count, mean and variance of the given columns.
+
+    Parameters:
+        df (pd.DataFrame): DataFrame containing student data.
+        columns (list): Columns to aggregate (default is all but is_adhd).
+
+    Returns:
+        pd.DataFrame: Aggregates indexed by (column, statistic) with one
+        column per ADHD group.
+    """
+    if columns is None:
+        columns = [column for column in df.columns if column != "is_adhd"]
+    aggregates = df.groupby("is_adhd")[columns].agg(GROUP_AGGREGATE_STATS)
+    return aggregates.T.reindex(columns=[True, False])
+
+def get_group_means(aggregates, columns):
+    """
+    Get the ADHD and non-ADHD means of the given columns.
+
+    Parameters:
+        aggregates (pd.DataFrame): Result of compute_group_aggregates.
+        columns (list): Columns to select.
+
+    Returns:
+        tuple: Series of ADHD means and Series of non-ADHD means.
+    """
+    means = aggregates.xs("mean", level=1).loc[columns]
+    return means[True], means[False]
+
+"""Streaming Summary Statistics for ADHD vs Non-ADHD Students
+
+•	GroupedStatsAccumulator keeps, for every column and ADHD group, the count, mean and sum of squared deviations (Welford/Chan updates), the minimum and maximum, and a histogram of integer values.
+
+•	update consumes one chunk at a time, one column at a time, so memory stays bounded by a single column of a block; merge combines accumulators built on separate chunks or in separate worker processes, so a dataset of any size is summarised in one sequential scan.
+
+•	to_aggregates returns the same layout as compute_group_aggregates, so the bar charts can be drawn directly from it.
+
+•	accumulate_dataset_stats scans a binary dataset directory in row blocks, optionally across a process pool.
+
+"""
+
+HISTOGRAM_MAX_VALUE = 100
+
+class GroupedStatsAccumulator:
+    """
+    Mergeable per-group summary statistics over a stream of chunks.
+    """
+
+    def __init__(self, columns, histogram_columns=None):
+        """
+        Initialize empty statistics for the given columns.
+
+        Parameters:
+            columns (list): Columns to summarise.
+            histogram_columns (list): Integer-valued columns to keep
+                histograms for (default is the uint8 schema columns).
+        """
+        self.columns = list(columns)
+        if histogram_columns is None:
+            histogram_columns = [column for column in self.columns
+                                 if STUDENT_SCHEMA.get(column) == np.uint8]
+        self.histogram_columns = list(histogram_columns)
+        num_columns = len(self.columns)
+        self.count = {group: np.zeros(num_columns) for group in (True, False)}
+        self.mean = {group: np.zeros(num_columns) for group in (True, False)}
+        self.m2 = {group: np.zeros(num_columns) for group in (True, False)}
+        self.min = {group: np.full(num_columns, np.inf)
+                    for group in (True, False)}
+        self.max = {group: np.full(num_columns, -np.inf)
+                    for group in (True, False)}
+        self.histogram = {group: np.zeros(
+            (len(self.histogram_columns), HISTOGRAM_MAX_VALUE + 1),
+            dtype=np.int64) for group in (True, False)}
+
+    def update(self, chunk):
+        """
+        Add a chunk of student data to the statistics.
+
+        Parameters:
+            chunk (pd.DataFrame or dict): Chunk with the is_adhd column and
+                the summarised columns.
+        """
+        is_adhd = np.asarray(chunk["is_adhd"], dtype=bool)
+        for group, rows in [(True, is_adhd), (False, ~is_adhd)]:
+            if not rows.any():
+                continue
+            num_columns = len(self.columns)
+            count, mean, m2 = (np.zeros(num_columns) for _ in range(3))
+            low = np.full(num_columns, np.inf)
+            high = np.full(num_columns, -np.inf)
+            for i, column in enumerate(self.columns):
+                values = np.asarray(chunk[column])[rows].astype(np.float64)
+                values = values[~np.isnan(values)]
+                if not len(values):
+                    continue
+                count[i] = len(values)
+                mean[i] = values.mean()
+                m2[i] = np.square(values - mean[i]).sum()
+                low[i] = values.min()
+                high[i] = values.max()
+            self._merge_moments(group, count, mean, m2)
+            self.min[group] = np.fmin(self.min[group], low)
+            self.max[group] = np.fmax(self.max[group], high)
+
+            for i, column in enumerate(self.histogram_columns):
+                column_values = np.asarray(chunk[column])[rows]
+                self.histogram[group][i] += np.bincount(
+                    np.clip(column_values, 0, HISTOGRAM_MAX_VALUE).astype(
+                        np.intp), minlength=HISTOGRAM_MAX_VALUE + 1)
+
+    def _merge_moments(self, group, count, mean, m2):
+        total = self.count[group] + count
+        delta = mean - self.mean[group]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weight = np.where(total > 0, count / total, 0.0)
+        self.mean[group] = self.mean[group] + delta * weight
+        self.m2[group] = (self.m2[group] + m2 +
+                          delta ** 2 * self.count[group] * weight)
+        self.count[group] = total
+
+    def merge(self, other):
+        """
+        Merge the statistics of another accumulator into this one.
+
+        Parameters:
+            other (GroupedStatsAccumulator): Accumulator over the same columns.
+
+        Returns:
+            GroupedStatsAccumulator: This accumulator.
+        """
+        if (other.columns != self.columns or
+                other.histogram_columns != self.histogram_columns):
+            raise ValueError("Accumulators must summarise the same columns.")
+        for group in (True, False):
+            self._merge_moments(group, other.count[group], other.mean[group],
+                                other.m2[group])
+            self.min[group] = np.fmin(self.min[group], other.min[group])
+            self.max[group] = np.fmax(self.max[group], other.max[group])
+            self.histogram[group] += other.histogram[group]
+        return self
+
+    def consume(self, chunks):
+        """
+        Add every chunk of a stream to the statistics.
+
+        Parameters:
+            chunks (iterable): Chunks of student data.
+
+        Returns:
+            GroupedStatsAccumulator: This accumulator.
+        """
+        for chunk in chunks:
+            self.update(chunk)
+        return self
+
+    def to_aggregates(self):
+        """
+        Get count, mean and variance in the compute_group_aggregates layout.
+
+        Returns:
+            pd.DataFrame: Aggregates indexed by (column, statistic) with one
+            column per ADHD group.
+        """
+        index = pd.MultiIndex.from_product([self.columns,
+                                            GROUP_AGGREGATE_STATS])
+        data = {}
+        for group in (True, False):
+            count = self.count[group]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                mean = np.where(count > 0, self.mean[group], np.nan)
+                var = np.where(count > 1, self.m2[group] / (count - 1),
+                               np.nan)
+            data[group] = np.column_stack([count, mean, var]).ravel()
+        return pd.DataFrame(data, index=index)
+
+    def summary(self):
+        """
+        Get a summary table of every column for both groups.
+
+        Returns:
+            pd.DataFrame: Count, mean, std, min and max per column and group.
+        """
+        tables = []
+        for group in (True, False):
+            count = self.count[group]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                std = np.sqrt(np.where(count > 1,
+                                       self.m2[group] / (count - 1), np.nan))
+            tables.append(pd.DataFrame({
+                "is_adhd": group, "column": self.columns, "count": count,
+                "mean": np.where(count > 0, self.mean[group], np.nan),
+                "std": std,
+                "min": np.where(count > 0, self.min[group], np.nan),
+                "max": np.where(count > 0, self.max[group], np.nan)}))
+        return pd.concat(tables, ignore_index=True)
+
+    def histograms(self, group):
+        """
+        Get the value histograms of one group.
+
+        Parameters:
+            group (bool): True for ADHD, False for non-ADHD students.
+
+        Returns:
+            pd.DataFrame: Counts with one row per column and one column per
+            integer value.
+        """
+        return pd.DataFrame(self.histogram[group],
+                            index=self.histogram_columns,
+                            columns=np.arange(HISTOGRAM_MAX_VALUE + 1))
+
+def _accumulate_dataset_rows(path, columns, start, stop, block_size):
+    arrays = open_dataset_columns(path, columns + ["is_adhd"])
+    accumulator = GroupedStatsAccumulator(columns)
+    for block_start in range(start, stop, block_size):
+        block_stop = min(block_start + block_size, stop)
+        accumulator.update({name: array[block_start:block_stop]
+                            for name, array in arrays.items()})
+    return accumulator
+
+def accumulate_dataset_stats(path, columns=None, block_size=65536,
+                             num_workers=1):
+    """
+    Compute grouped summary statistics of a binary dataset in one scan.
+
+    Parameters:
+        path (str): Dataset directory.
+        columns (list): Columns to summarise (default is all but is_adhd).
+        block_size (int): Number of rows read per block.
+        num_workers (int): Number of worker processes scanning row ranges.
+
+    Returns:
+        GroupedStatsAccumulator: Statistics of the whole dataset.
+    """
+    schema = read_dataset_schema(path)
+    if columns is None:
+        columns = [column["name"] for column in schema["columns"]
+                   if column["name"] != "is_adhd"]
+    num_rows = schema["num_rows"]
+    if num_workers <= 1:
+        return _accumulate_dataset_rows(path, columns, 0, num_rows,
+                                        block_size)
+
+    bounds = np.linspace(0, num_rows, num_workers + 1).astype(int)
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = [executor.submit(_accumulate_dataset_rows, path, columns,
+                                   start, stop, block_size)
+                   for start, stop in zip(bounds[:-1], bounds[1:])]
+        accumulator = GroupedStatsAccumulator(columns)
+        for future in futures:
+            accumulator.merge(future.result())
+    return accumulator
+
 """Function to plot Average Response Curve and Bar charts
 
 •	Plots average response curves and bar charts for ADHD and Non-ADHD groups.
 
 •	Uses Seaborn and Matplotlib for visualisation.
 
-•	Adds labels to bars dynamically based on their width.
+•	Adds labels to bars dynamically based on their width, one bar_label call per group.
+
+•	Takes precomputed aggregates instead of the raw rows when they are given.
 
 """
 
-def plot_average_response_and_distribution(df, columns, title, ax):
+def plot_average_response_and_distribution(df, columns, title, ax,
+                                           aggregates=None):
     """
     Plot average response curves and bar charts.
 
     Parameters:
-        df (pd.DataFrame): DataFrame containing student data.
+        df (pd.DataFrame): DataFrame containing student data, may be None
+            when aggregates are given.
         columns (list): List of column names to plot.
         title (str): Title of the plot.
         ax (matplotlib.axes.Axes): Axes object to plot on.
+        aggregates (pd.DataFrame): Precomputed compute_group_aggregates result.
     """
     sns.set(style="whitegrid")
 
-    adhd_avg = df[df['is_adhd'] == True][columns].mean()
-    non_adhd_avg = df[df['is_adhd'] == False][columns].mean()
+    if aggregates is None:
+        aggregates = compute_group_aggregates(df, columns)
+    adhd_avg, non_adhd_avg = get_group_means(aggregates, columns)
 
     index = np.arange(len(columns))
     bar_width = 0.35
@@ -418,13 +1800,104 @@ def plot_average_response_and_distribution(df, columns, title, ax):
               bbox_to_anchor=(1, 1))
     ax.grid(True, axis='x', linestyle='--', alpha=0.7)
 
-    for bars in [bars1, bars2]:
-        for bar in bars:
-            label_position = bar.get_width() + 0.02 * max(adhd_avg.max(),
-                                                          non_adhd_avg.max())
-            ax.text(label_position, bar.get_y() + bar.get_height() / 2,
-                    f'{bar.get_width():.1f}',
-                    va='center', ha='left', fontsize=14, color='black')
+    for bars, values in [(bars1, adhd_avg), (bars2, non_adhd_avg)]:
+        ax.bar_label(bars, labels=[f'{value:.1f}' for value in values],
+                     padding=5, fontsize=14, color='black')
+
+"""Headless Report Rendering
+
+•	REPORT_FIGURES lists the bar chart figures of the report: output file name, figure size and the (columns, title) of every subplot.
+
+•	draw_report_figure draws one figure from precomputed aggregates.
+
+•	render_reports renders the figures of one or many datasets in a process pool on Agg canvases that bypass pyplot, so the caller's backend is left untouched, at a configurable dpi and file format (png, or vector formats such as svg and pdf).
+
+"""
+
+REPORT_FIGURES = [
+    ("parent_bar_chart", (18, 24),
+     [(PARENT_COLUMNS, "Average Parental Scores and Distribution for ADHD "
+                       "and Non-ADHD Students")]),
+    ("teacher_bar_chart", (18, 24),
+     [(TEACHER_COLUMNS, "Average Teacher Scores and Distribution for ADHD "
+                        "and Non-ADHD Students")]),
+    ("english_math_bar_charts", (18, 24),
+     [(ENGLISH_COLUMNS, "Average English Scores and Distribution for ADHD "
+                        "and Non-ADHD Students"),
+      (MATH_COLUMNS, "Average Math Scores and Distribution for ADHD and "
+                     "Non-ADHD Students")]),
+]
+
+def draw_report_figure(figure_spec, aggregates, fig=None):
+    """
+    Draw one report figure from precomputed aggregates.
+
+    Parameters:
+        figure_spec (tuple): Entry of REPORT_FIGURES.
+        aggregates (pd.DataFrame): Result of compute_group_aggregates.
+        fig (matplotlib.figure.Figure): Figure to draw on (default is a new
+            pyplot figure).
+
+    Returns:
+        matplotlib.figure.Figure: The drawn figure.
+    """
+    _, figsize, panels = figure_spec
+    if fig is None:
+        fig = plt.figure(figsize=figsize)
+    axs = fig.subplots(len(panels), 1, squeeze=False)
+    for ax, (columns, title) in zip(axs[:, 0], panels):
+        plot_average_response_and_distribution(None, columns, title, ax,
+                                               aggregates)
+    fig.tight_layout()
+    return fig
+
+def _render_report_figure(figure_spec, aggregates, output_dir, dpi, fmt):
+    fig = Figure(figsize=figure_spec[1])
+    FigureCanvasAgg(fig)
+    draw_report_figure(figure_spec, aggregates, fig)
+    filepath = os.path.join(output_dir, f"{figure_spec[0]}.{fmt}")
+    fig.savefig(filepath, dpi=dpi, format=fmt, bbox_inches='tight')
+    return filepath
+
+def render_reports(reports, output_dir=".", dpi=300, fmt="png",
+                   num_workers=None):
+    """
+    Render the report figures of one or more datasets in parallel.
+
+    Parameters:
+        reports (dict): Aggregates per report name; each report is written
+            to its own subdirectory of output_dir (use "" for output_dir).
+        output_dir (str): Directory to write the figures to.
+        dpi (int): Resolution of raster output.
+        fmt (str): Output format, e.g. "png", "svg" or "pdf".
+        num_workers (int): Number of worker processes (default: CPU count).
+
+    Returns:
+        dict: List of written file paths per report name.
+    """
+    tasks = []
+    for name, aggregates in reports.items():
+        report_dir = os.path.join(output_dir, name)
+        os.makedirs(report_dir, exist_ok=True)
+        tasks += [(name, figure_spec, aggregates, report_dir)
+                  for figure_spec in REPORT_FIGURES]
+
+    if num_workers is None:
+        num_workers = min(len(tasks), os.cpu_count() or 1)
+    filepaths = {name: [] for name in reports}
+    if num_workers <= 1:
+        for name, figure_spec, aggregates, report_dir in tasks:
+            filepaths[name].append(_render_report_figure(
+                figure_spec, aggregates, report_dir, dpi, fmt))
+        return filepaths
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = [(name, executor.submit(_render_report_figure, figure_spec,
+                                          aggregates, report_dir, dpi, fmt))
+                   for name, figure_spec, aggregates, report_dir in tasks]
+        for name, future in futures:
+            filepaths[name].append(future.result())
+    return filepaths
 
 """
 
@@ -440,65 +1913,30 @@ if __name__ == "__main__":
     num_students = 10000
     adhd_percentage = 0.10  # Increased ADHD percentage to 10%
     noise_percentage = 0.02  # Reduced noise percentage to 2%
+    export_excel = False  # Excel export is slow and limited to ~1M rows
+    headless = False  # Render figures in worker processes without showing
 
     df = generate_student_data(num_students, adhd_percentage=adhd_percentage,
                                noise_percentage=noise_percentage)
 
-    df.to_excel("student_data_non_normalized.xlsx", index=False)
-    print("Student data generated and saved to student_data_non_normalized.xlsx")
-
-    parent_columns = [f'parent_inatt_q{i + 1}' for i in range(9)] + \
-                     [f'parent_hyper_q{i + 1}' for i in range(9)] + \
-                     [f'parent_odd_q{i + 1}' for i in range(8)] + \
-                     [f'parent_cd_q{i + 1}' for i in range(14)] + \
-                     [f'parent_anx_q{i + 1}' for i in range(7)] + \
-                     [f'parent_sch_perf_q{i + 1}' for i in range(3)] + \
-                     [f'parent_soc_func_q{i + 1}' for i in range(3)]
-    teacher_columns = [f'teacher_inatt_q{i + 1}' for i in range(9)] + \
-                      [f'teacher_hyper_q{i + 1}' for i in range(9)] + \
-                      [f'teacher_odd_q{i + 1}' for i in range(8)] + \
-                      [f'teacher_cd_q{i + 1}' for i in range(14)] + \
-                      [f'teacher_anx_q{i + 1}' for i in range(7)] + \
-                      [f'teacher_sch_perf_q{i + 1}' for i in range(3)] + \
-                      [f'teacher_soc_func_q{i + 1}' for i in range(3)]
-    english_columns = ["Eng_read_comp", "Eng_vocab_dev", "Eng_fluency",
-                       "Eng_decoding", "Eng_fig_lang", "Eng_read_detail",
-                       "Eng_narr_struct", "Eng_draw_concl", "Eng_read_aloud",
-                       "Eng_expr"]
-    math_columns = ["Math_mult_div", "Math_fractions", "Math_decimals",
-                    "Math_time", "Math_place_val", "Math_measure",
-                    "Math_geometry", "Math_add_sub", "Math_word_prob"]
-
-    fig1, ax1 = plt.subplots(1, 1, figsize=(18, 24))
-    fig2, ax2 = plt.subplots(1, 1, figsize=(18, 24))
-    fig3, axs3 = plt.subplots(2, 1, figsize=(18, 24))
-
-    plot_average_response_and_distribution(
-        df, parent_columns,
-        ("Average Parental Scores and Distribution for ADHD and "
-         "Non-ADHD Students"), ax1)
-    plot_average_response_and_distribution(
-        df, teacher_columns,
-        ("Average Teacher Scores and Distribution for ADHD and "
-         "Non-ADHD Students"), ax2)
-    plot_average_response_and_distribution(
-        df, english_columns,
-        ("Average English Scores and Distribution for ADHD and "
-         "Non-ADHD Students"), axs3[0])
-    plot_average_response_and_distribution(
-        df, math_columns,
-        ("Average Math Scores and Distribution for ADHD and "
-         "Non-ADHD Students"), axs3[1])
-
-    fig1.tight_layout()
-    fig2.tight_layout()
-    fig3.tight_layout()
-
-    fig1.savefig('parent_bar_chart.png', dpi=300, bbox_inches='tight')
-    fig2.savefig('teacher_bar_chart.png', dpi=300, bbox_inches='tight')
-    fig3.savefig('english_math_bar_charts.png', dpi=300, bbox_inches='tight')
-
-    plt.show()
+    save_dataset(df, "student_data_non_normalized")
+    print("Student data generated and saved to student_data_non_normalized/")
+
+    if export_excel:
+        df.to_excel("student_data_non_normalized.xlsx", index=False)
+        print("Student data exported to student_data_non_normalized.xlsx")
+
+    aggregates = compute_group_aggregates(
+        df, PARENT_COLUMNS + TEACHER_COLUMNS + ENGLISH_COLUMNS + MATH_COLUMNS)
+
+    if headless:
+        render_reports({"": aggregates}, dpi=300, fmt="png")
+    else:
+        for figure_spec in REPORT_FIGURES:
+            fig = draw_report_figure(figure_spec, aggregates)
+            fig.savefig(f'{figure_spec[0]}.png', dpi=300, bbox_inches='tight')
+
+        plt.show()
 
     print("\nLabel Expansions:")
     print("Eng_read_comp: English Reading Comprehension")
@@ -10,14 +10,16 @@ Explanation for Each Section
 
 Data Loading and Preprocessing:
 
-The dataset is loaded from an Excel file and features (X) and the target variable (y) are separated.
+The dataset is loaded from the binary dataset directory written by part 1 and features (X) and the target variable (y) are separated.
 The data is split into training and test sets using train_test_split.
 Numerical features are normalised using StandardScaler.
+The split, the scaled matrices and the fitted scaler are cached by dataset content hash (preprocess_dataset in part 1).
 
 RBM Class:
 
 The RBM class is defined to implement the Restricted Boltzmann Machine for feature extraction.
 The class includes methods for sampling hidden units given visible units, sampling visible units given hidden units, performing Gibbs sampling, and training the RBM.
+Training uses CD-k or persistent CD with a learning rate, momentum and weight decay, and reports the reconstruction error per epoch.
 
 FNN Class:
 
@@ -25,8 +27,13 @@ The FNN class is defined to implement a Feedforward Neural Network for classific
 The class includes methods for initializing the network and performing the forward pass.
 Training Functions:
 
-The train_fnn function trains the FNN model using the provided DataLoader.
-The prepare_dataloader function prepares data for PyTorch DataLoader.
+The train_fnn function trains the FNN model using the provided batch loader.
+The prepare_dataloader function prepares shuffled in-memory minibatches (TensorBatchLoader) or a PyTorch DataLoader.
+For datasets larger than memory, MemmapBatchLoader reads, scales and optionally RBM-transforms batches of a memory-mapped feature matrix.
+FeatureStore keeps extracted RBM features on disk, keyed by the RBM weights and the input data, with least-recently-used eviction.
+RBM.train and train_fnn save periodic checkpoints (weights, optimizer and RNG state) and resume from them; run_trials logs completed grid-search trials so restarted sweeps skip them.
+Both support early stopping with patience and best-weight restore (RBM on its reconstruction error, FNN on a held-out loss) and return their per-epoch metrics as a list of dicts.
+train_rbm_data_parallel and train_fnn_data_parallel shard every batch across local CPU processes and all-reduce the CD updates or gradients over gloo.
 
 Grid Search and Cross-Validation:
 
@@ -46,35 +53,208 @@ The FNN is also trained and evaluated on the original scaled features.
 The performance of models using RBM features is compared with models using original features to determine if RBM improves performance.
 """
 
+import glob
+import hashlib
+import json
+import mmap
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import pandas as pd
 import numpy as np
 import torch
+import torch.distributed as dist
+import torch.multiprocessing
 import torch.nn as nn
 import torch.optim as optim
 import matplotlib.pyplot as plt
 from sklearn.model_selection import KFold, train_test_split
 from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import (accuracy_score, precision_score, recall_score,
-                             f1_score, roc_auc_score, roc_curve,
-                             confusion_matrix, ConfusionMatrixDisplay)
+from sklearn.metrics import ConfusionMatrixDisplay
 import joblib
+from project_part_1_dataset import (dataset_content_hash,
+                                    open_dataset_columns,
+                                    preprocess_dataset)
 
-# Load the dataset
-data = pd.read_excel('/content/drive/MyDrive/Project_ADHD/'
-                     'student_data_ADHD.xlsx')
+# File in a checkpoint directory listing the completed grid-search trials
+GRID_TRIALS_LOG = 'completed_trials.jsonl'
 
-# Separate features and target variable
-X = data.drop('is_adhd', axis=1)  # Features
-y = data['is_adhd']  # Target variable
+# Layout version of training checkpoints and trial log records; files
+# written with another version are ignored instead of resumed
+CHECKPOINT_VERSION = 3
 
-# Initial train/test split
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42, stratify=y)
 
-# Normalize numerical features
-scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
-X_test_scaled = scaler.transform(X_test)
+def save_checkpoint(path, state):
+    """
+    Write a training checkpoint atomically.
+
+    Parameters:
+    path (str): Checkpoint file.
+    state (dict): Training state to save with torch.save.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    torch.save(state, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path, config):
+    """
+    Load a training checkpoint written with the same configuration.
+
+    Parameters:
+    path (str): Checkpoint file, or None.
+    config (dict): Configuration the checkpoint must have been saved with.
+
+    Returns:
+    dict: The saved training state, or None if there is no matching
+    checkpoint.
+    """
+    if path is None or not os.path.exists(path):
+        return None
+    state = torch.load(path)
+    if state.get('config') != config:
+        return None
+    return state
+
+
+def gather_process_states(state, distributed=False):
+    """
+    Collect the per-process part of a checkpoint from every process.
+
+    Data-parallel processes share their weights but not their RNG state,
+    so a checkpoint written by the first process keeps the state of each.
+
+    Parameters:
+    state (dict): State of this process.
+    distributed (bool): Gather over the default process group.
+
+    Returns:
+    list of dict: The state of every process, in rank order.
+    """
+    if not distributed:
+        return [state]
+    states = [None] * dist.get_world_size()
+    dist.all_gather_object(states, state)
+    return states
+
+
+def all_reduce_weighted(tensors, weight):
+    """
+    Average tensors in place across data-parallel processes.
+
+    Every process contributes its tensors weighted by weight, typically its
+    number of rows in the batch, and all tensors are reduced in one
+    all-reduce over the default process group.
+
+    Parameters:
+    tensors (list of torch.Tensor): Per-process averages to combine.
+    weight (float): Weight of this process.
+
+    Returns:
+    list of torch.Tensor: The same tensors, now holding the weighted
+    average over all processes.
+    """
+    # Processes without rows contribute zeros instead of NaN means
+    flat = torch.cat([tensor.detach().reshape(-1) * weight if weight else
+                      torch.zeros(tensor.numel()) for tensor in tensors] +
+                     [torch.tensor([float(weight)])])
+    dist.all_reduce(flat)
+    total_weight = max(flat[-1].item(), 1e-12)
+    offset = 0
+    for tensor in tensors:
+        tensor.copy_(flat[offset:offset + tensor.numel()].view_as(tensor) /
+                     total_weight)
+        offset += tensor.numel()
+    return tensors
+
+
+class EarlyStopping:
+    """
+    Track a monitored loss per epoch and decide when training has stopped
+    improving.
+
+    The weights of the best epoch are kept so they can be restored once
+    training stops.
+    """
+
+    def __init__(self, patience, min_delta=0.0):
+        """
+        Parameters:
+        patience (int): Number of epochs without improvement before stopping.
+        min_delta (float): Minimum decrease of the loss that counts as an
+            improvement.
+        """
+        self.patience = patience
+        self.min_delta = min_delta
+        self.best_loss = float('inf')
+        self.best_epoch = 0
+        self.best_state = None
+        self.epochs_without_improvement = 0
+
+    @property
+    def should_stop(self):
+        return self.epochs_without_improvement >= self.patience
+
+    def step(self, loss, model, epoch):
+        """
+        Record the monitored loss of an epoch.
+
+        Parameters:
+        loss (float): Monitored loss of the epoch.
+        model (nn.Module): Model whose weights are kept if the loss improved.
+        epoch (int): Epoch number.
+
+        Returns:
+        bool: True if training should stop.
+        """
+        if loss < self.best_loss - self.min_delta:
+            self.best_loss = loss
+            self.best_epoch = epoch
+            self.best_state = {name: value.detach().clone()
+                               for name, value in model.state_dict().items()}
+            self.epochs_without_improvement = 0
+        else:
+            self.epochs_without_improvement += 1
+        return self.should_stop
+
+    def restore_best(self, model):
+        """
+        Load the weights of the best epoch into the model.
+
+        Parameters:
+        model (nn.Module): Model to restore.
+        """
+        if self.best_state is not None:
+            model.load_state_dict(self.best_state)
+
+    def state_dict(self):
+        """
+        Get the progress of the monitored loss for a checkpoint; patience
+        and min_delta are left to the resuming caller.
+
+        Returns:
+        dict: Best loss, best epoch, best weights and epochs without
+        improvement.
+        """
+        return {"best_loss": self.best_loss, "best_epoch": self.best_epoch,
+                "best_state": self.best_state,
+                "epochs_without_improvement":
+                    self.epochs_without_improvement}
+
+    def load_state_dict(self, state):
+        """
+        Restore the progress saved with state_dict.
+
+        Parameters:
+        state (dict): Result of state_dict.
+        """
+        self.best_loss = state["best_loss"]
+        self.best_epoch = state["best_epoch"]
+        self.best_state = state["best_state"]
+        self.epochs_without_improvement = state["epochs_without_improvement"]
 
 
 class RBM(nn.Module):
@@ -94,6 +274,34 @@ class RBM(nn.Module):
         self.W = nn.Parameter(torch.randn(n_visible, n_hidden) * 0.01)
         self.v_bias = nn.Parameter(torch.zeros(n_visible))
         self.h_bias = nn.Parameter(torch.zeros(n_hidden))
+        # Training state kept outside the state_dict so saved models stay
+        # loadable by the prediction app
+        self.persistent_chain = None
+        self.velocities = None
+
+    def hidden_probs(self, v):
+        """
+        Compute hidden unit probabilities given visible units.
+
+        Parameters:
+        v (torch.Tensor): Visible units.
+
+        Returns:
+        torch.Tensor: Probabilities of the hidden units being on.
+        """
+        return torch.sigmoid(torch.matmul(v, self.W) + self.h_bias)
+
+    def visible_probs(self, h):
+        """
+        Compute visible unit probabilities given hidden units.
+
+        Parameters:
+        h (torch.Tensor): Hidden units.
+
+        Returns:
+        torch.Tensor: Probabilities of the visible units being on.
+        """
+        return torch.sigmoid(torch.matmul(h, self.W.t()) + self.v_bias)
 
     def sample_h_given_v(self, v):
         """
@@ -167,36 +375,400 @@ class RBM(nn.Module):
         self.v_bias.data += positive_visible - negative_visible
         self.h_bias.data += positive_hidden_bias - negative_hidden_bias
 
-    def train(self, v_data, epochs=10, learning_rate=0.1, batch_size=10):
+    @torch.no_grad()
+    def contrastive_divergence_step(self, v_data, learning_rate=0.1,
+                                    momentum=0.0, weight_decay=0.0, k=1,
+                                    persistent=False, distributed=False):
         """
-        Train the RBM model.
+        Perform one CD-k or persistent CD update on a batch.
+
+        Every activation is computed once per Gibbs step and reused for both
+        the sampling and the gradient statistics.
 
         Parameters:
         v_data (torch.Tensor): Visible data.
-        epochs (int): Number of training epochs.
+        learning_rate (float): Learning rate.
+        momentum (float): Momentum of the parameter updates.
+        weight_decay (float): L2 penalty on the weights.
+        k (int): Number of Gibbs steps in the negative phase, at least 1.
+        persistent (bool): Continue the negative chain from the previous
+            update instead of restarting it at the data.
+        distributed (bool): v_data is this process's shard of the batch;
+            average the updates of all processes before applying them.
+
+        Returns:
+        float: Mean squared reconstruction error of the batch.
+        """
+        if k < 1:
+            raise ValueError("k must be at least 1 Gibbs step.")
+        batch_size = v_data.size(0)
+        h_prob_pos = self.hidden_probs(v_data)
+
+        if persistent and self.persistent_chain is not None:
+            h_sample = torch.bernoulli(
+                self.hidden_probs(self.persistent_chain))
+        else:
+            h_sample = torch.bernoulli(h_prob_pos)
+
+        reconstruction = None
+        for _ in range(k):
+            v_prob_neg = self.visible_probs(h_sample)
+            if reconstruction is None and not persistent:
+                reconstruction = v_prob_neg
+            v_neg = torch.bernoulli(v_prob_neg)
+            h_prob_neg = self.hidden_probs(v_neg)
+            h_sample = torch.bernoulli(h_prob_neg)
+        if persistent:
+            self.persistent_chain = v_neg
+            reconstruction = self.visible_probs(h_prob_pos)
+
+        chain_size = v_neg.size(0)
+        grad_W = (torch.matmul(v_data.t(), h_prob_pos) / batch_size -
+                  torch.matmul(v_neg.t(), h_prob_neg) / chain_size -
+                  weight_decay * self.W)
+        grad_v_bias = v_data.mean(dim=0) - v_neg.mean(dim=0)
+        grad_h_bias = h_prob_pos.mean(dim=0) - h_prob_neg.mean(dim=0)
+        error = torch.mean((v_data - reconstruction) ** 2)
+        if distributed:
+            all_reduce_weighted([grad_W, grad_v_bias, grad_h_bias, error],
+                                batch_size)
+
+        if self.velocities is None:
+            self.velocities = [torch.zeros_like(self.W),
+                               torch.zeros_like(self.v_bias),
+                               torch.zeros_like(self.h_bias)]
+        for param, velocity, grad in zip(
+                [self.W, self.v_bias, self.h_bias], self.velocities,
+                [grad_W, grad_v_bias, grad_h_bias]):
+            velocity.mul_(momentum).add_(grad, alpha=learning_rate)
+            param.add_(velocity)
+
+        return error.item()
+
+    def train(self, v_data, epochs=10, learning_rate=0.1, batch_size=10,
+              momentum=0.0, weight_decay=0.0, k=1, persistent=False,
+              shuffle=True, verbose=False, checkpoint_path=None,
+              checkpoint_every=1, patience=None, min_delta=0.0,
+              restore_best=True, distributed=False):
+        """
+        Train the RBM model.
+
+        Parameters:
+        v_data (torch.Tensor or MemmapBatchLoader): Visible data, or a loader
+            whose batches replace batch_size and shuffle.
+        epochs (int): Maximum number of training epochs.
         learning_rate (float): Learning rate.
         batch_size (int): Batch size.
+        momentum (float): Momentum of the parameter updates.
+        weight_decay (float): L2 penalty on the weights.
+        k (int): Number of Gibbs steps per update (CD-k), at least 1.
+        persistent (bool): Use persistent contrastive divergence.
+        shuffle (bool): Shuffle the rows at the start of every epoch.
+        verbose (bool): Print the reconstruction error after every epoch.
+        checkpoint_path (str): File the weights, chain, velocities, history
+            and RNG states are saved to; training resumes from it when it
+            exists with the same configuration. In distributed training only
+            the first process writes it, with the chain and torch RNG state
+            of every process.
+        checkpoint_every (int): Number of epochs between checkpoints.
+        patience (int): Stop once the reconstruction error has not improved
+            for this many epochs, or None to always train all epochs.
+        min_delta (float): Minimum decrease of the reconstruction error that
+            counts as an improvement.
+        restore_best (bool): With patience, finish with the weights of the
+            epoch with the lowest reconstruction error.
+        distributed (bool): v_data yields this process's shards of the
+            batches (see train_rbm_data_parallel).
+
+        Returns:
+        list of dict: Epoch number and mean reconstruction error per epoch.
         """
-        optimizer = optim.SGD(self.parameters(), lr=learning_rate)
+        if k < 1:
+            raise ValueError("k must be at least 1 Gibbs step.")
+        self.persistent_chain = None
+        self.velocities = None
+        history = []
+        rank = dist.get_rank() if distributed else 0
+        generator = getattr(v_data, "generator", None)
+        config = {"version": CHECKPOINT_VERSION,
+                  "shape": tuple(self.W.shape), "learning_rate": learning_rate,
+                  "batch_size": batch_size, "momentum": momentum,
+                  "weight_decay": weight_decay, "k": k,
+                  "persistent": persistent,
+                  "world_size": dist.get_world_size() if distributed else 1}
+        stopper = EarlyStopping(patience, min_delta) if patience else None
+        state = load_checkpoint(checkpoint_path, config)
+        if state is not None:
+            self.load_state_dict(state["model"])
+            self.velocities = state["velocities"]
+            history = state["history"]
+            process_state = state["processes"][rank]
+            self.persistent_chain = process_state["persistent_chain"]
+            torch.set_rng_state(process_state["rng_state"])
+            if generator is not None and state["generator_state"] is not None:
+                generator.set_state(state["generator_state"])
+            if stopper is not None and state["early_stopping"] is not None:
+                stopper.load_state_dict(state["early_stopping"])
+        for epoch in range(len(history), epochs):
+            if stopper is not None and stopper.should_stop:
+                break
+            if isinstance(v_data, torch.Tensor):
+                order = torch.randperm(len(v_data)) if shuffle else None
+                batches = (v_data[i:i + batch_size] if order is None
+                           else v_data[order[i:i + batch_size]]
+                           for i in range(0, len(v_data), batch_size))
+            else:
+                batches = (batch for batch, _ in v_data)
+            total_error = 0.0
+            total_rows = 0
+            for batch in batches:
+                error = self.contrastive_divergence_step(
+                    batch, learning_rate, momentum, weight_decay, k,
+                    persistent, distributed)
+                total_error += error * len(batch)
+                total_rows += len(batch)
+            epoch_error = total_error / max(total_rows, 1)
+            if distributed:
+                epoch_error = all_reduce_weighted(
+                    [torch.tensor(epoch_error)], total_rows)[0].item()
+            history.append({"epoch": epoch + 1,
+                            "reconstruction_error": epoch_error})
+            if verbose:
+                print(f'RBM Epoch [{epoch + 1}/{epochs}], Reconstruction '
+                      f'Error: {history[-1]["reconstruction_error"]:.4f}')
+            if stopper is not None:
+                stopper.step(history[-1]["reconstruction_error"], self,
+                             epoch + 1)
+            if checkpoint_path is not None and (
+                    (epoch + 1) % checkpoint_every == 0 or
+                    epoch + 1 == epochs or
+                    (stopper is not None and stopper.should_stop)):
+                processes = gather_process_states(
+                    {"persistent_chain": self.persistent_chain,
+                     "rng_state": torch.get_rng_state()}, distributed)
+                if rank == 0:
+                    save_checkpoint(checkpoint_path, {
+                        "config": config, "model": self.state_dict(),
+                        "velocities": self.velocities, "history": history,
+                        "early_stopping": None if stopper is None else
+                        stopper.state_dict(),
+                        "processes": processes,
+                        "generator_state": None if generator is None else
+                        generator.get_state()})
+        if stopper is not None and restore_best:
+            stopper.restore_best(self)
+        return history
+
+
+def benchmark_rbm_training(n_samples=8000, n_visible=134, n_hidden=128,
+                           epochs=2, batch_size=256):
+    """
+    Compare epoch time of the original train_step loop and the CD engine.
+
+    Parameters:
+    n_samples (int): Number of synthetic training rows.
+    n_visible (int): Number of visible units.
+    n_hidden (int): Number of hidden units.
+    epochs (int): Number of epochs to time.
+    batch_size (int): Batch size of the CD engine.
+
+    Returns:
+    dict: Seconds per epoch for each implementation.
+    """
+    v_data = torch.randn(n_samples, n_visible)
+
+    rbm = RBM(n_visible, n_hidden)
+    start = time.perf_counter()
+    with torch.no_grad():
         for epoch in range(epochs):
-            for i in range(0, len(v_data), batch_size):
-                batch = v_data[i:i+batch_size]
-                self.train_step(batch)
+            for i in range(0, n_samples, 10):
+                rbm.train_step(v_data[i:i + 10])
+    original = (time.perf_counter() - start) / epochs
+
+    rbm = RBM(n_visible, n_hidden)
+    start = time.perf_counter()
+    rbm.train(v_data, epochs=epochs, batch_size=batch_size)
+    engine = (time.perf_counter() - start) / epochs
 
+    print(f'Original: {original:.3f} s/epoch (batch size 10), '
+          f'CD engine: {engine:.3f} s/epoch (batch size {batch_size})')
+    return {"original": original, "engine": engine}
 
-def extract_features(v_data, rbm):
+
+def extract_features(v_data, rbm, mean_field=False, batch_size=65536):
     """
     Extract features using the trained RBM.
 
     Parameters:
     v_data (np.array): Visible data.
     rbm (RBM): Trained RBM model.
+    mean_field (bool): Return the hidden probabilities instead of Bernoulli
+        samples, so identical inputs always give identical features.
+    batch_size (int): Number of rows per forward pass.
 
     Returns:
     np.array: Extracted features.
     """
-    h_prob = rbm.sample_h_given_v(torch.from_numpy(v_data).float())
-    return h_prob.detach().numpy()
+    features = np.empty((len(v_data), rbm.h_bias.numel()), dtype=np.float32)
+    with torch.inference_mode():
+        for i in range(0, len(v_data), batch_size):
+            batch = torch.as_tensor(v_data[i:i + batch_size],
+                                    dtype=torch.float32)
+            h_prob = rbm.hidden_probs(batch)
+            if not mean_field:
+                h_prob = torch.bernoulli(h_prob)
+            features[i:i + batch_size] = h_prob.numpy()
+    return features
+
+
+class FeatureStore:
+    """
+    On-disk store of RBM hidden features.
+
+    Features are saved as .npy files keyed by a hash of the RBM weights, the
+    input data and the feature mode, so FNN retraining, evaluation and
+    comparison runs load them instead of re-running the RBM. When the store
+    grows beyond max_bytes the least recently used files are deleted.
+    """
+
+    def __init__(self, directory, max_bytes=2 * 1024 ** 3):
+        """
+        Parameters:
+        directory (str): Directory holding the feature files.
+        max_bytes (int): Size limit of the store on disk.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, v_data, rbm, mean_field=False, block_rows=65536):
+        """
+        Hash the RBM weights, the input data and the feature mode.
+
+        Parameters:
+        v_data (np.array): Visible data.
+        rbm (RBM): Trained RBM model.
+        mean_field (bool): Feature mode passed to extract_features.
+        block_rows (int): Number of input rows hashed at a time.
+
+        Returns:
+        str: Hexadecimal key of the features.
+        """
+        digest = hashlib.sha256()
+        digest.update(str((v_data.shape, mean_field)).encode())
+        for tensor in (rbm.W, rbm.h_bias):
+            digest.update(tensor.detach().cpu().numpy().tobytes())
+        for start in range(0, len(v_data), block_rows):
+            digest.update(np.ascontiguousarray(
+                v_data[start:start + block_rows], dtype=np.float32).data)
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.npy")
+
+    def get(self, key, mmap_mode='c'):
+        """
+        Load stored features.
+
+        Parameters:
+        key (str): Key returned by key().
+        mmap_mode (str): Memory-map mode of the returned array.
+
+        Returns:
+        np.array: The features, or None if they are not stored.
+        """
+        try:
+            features = np.load(self.path(key), mmap_mode=mmap_mode)
+        except FileNotFoundError:
+            return None
+        try:
+            # Mark the entry as recently used for eviction
+            os.utime(self.path(key))
+        except FileNotFoundError:
+            # Evicted by another process after loading; the memory map
+            # stays readable
+            pass
+        return features
+
+    def put(self, key, features):
+        """
+        Store features and evict old entries above the size limit.
+
+        Parameters:
+        key (str): Key returned by key().
+        features (np.array): Features to store.
+        """
+        tmp_path = f"{self.path(key)}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, features)
+        os.replace(tmp_path, self.path(key))
+        self.evict(keep=key)
+
+    def evict(self, keep=None):
+        """
+        Delete least recently used entries until the store fits max_bytes.
+
+        Parameters:
+        keep (str): Key that is never deleted, e.g. the entry just written.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.npy'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name[:-4]))
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def extract(self, v_data, rbm, mean_field=False):
+        """
+        Load the RBM features of v_data, computing and storing them if
+        needed.
+
+        Parameters:
+        v_data (np.array): Visible data.
+        rbm (RBM): Trained RBM model.
+        mean_field (bool): Feature mode passed to extract_features.
+
+        Returns:
+        np.array: Extracted features.
+        """
+        key = self.key(v_data, rbm, mean_field)
+        features = self.get(key)
+        if features is None:
+            features = extract_features(v_data, rbm, mean_field)
+            self.put(key, features)
+        return features
+
+
+def extract_rbm_features(v_data, rbm, mean_field=False, feature_store=None):
+    """
+    Extract RBM features through the feature store if one is given.
+
+    Parameters:
+    v_data (np.array): Visible data.
+    rbm (RBM): Trained RBM model.
+    mean_field (bool): Return the hidden probabilities.
+    feature_store (FeatureStore): Store to load and save the features.
+
+    Returns:
+    np.array: Extracted features.
+    """
+    if feature_store is None:
+        return extract_features(v_data, rbm, mean_field)
+    return feature_store.extract(v_data, rbm, mean_field)
 
 
 class FNN(nn.Module):
@@ -233,7 +805,72 @@ class FNN(nn.Module):
         return x
 
 
-def train_fnn(model, criterion, optimizer, dataloader, num_epochs=10):
+class TensorBatchLoader:
+    """
+    In-memory minibatch iterator over feature and label tensors.
+
+    Each epoch draws one permutation, gathers the shuffled rows once and
+    yields contiguous slices of them, instead of indexing and collating
+    every row in Python as torch.utils.data.DataLoader does.
+    """
+
+    def __init__(self, X, y, batch_size=32, shuffle=True, drop_last=False):
+        """
+        Parameters:
+        X (torch.Tensor): Feature data.
+        y (torch.Tensor): Target data.
+        batch_size (int): Batch size.
+        shuffle (bool): Shuffle the rows at the start of every epoch.
+        drop_last (bool): Skip the final batch if it is incomplete.
+        """
+        self.X = X
+        self.y = y
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+
+    def __len__(self):
+        if self.drop_last:
+            return len(self.X) // self.batch_size
+        return -(-len(self.X) // self.batch_size)
+
+    def __iter__(self):
+        X, y = self.X, self.y
+        if self.shuffle:
+            permutation = torch.randperm(len(X))
+            X, y = X[permutation], y[permutation]
+        for i in range(len(self)):
+            start = i * self.batch_size
+            yield (X[start:start + self.batch_size],
+                   y[start:start + self.batch_size])
+
+
+def validation_loss(model, criterion, X, y=None):
+    """
+    Compute the loss of a model on a whole split.
+
+    Parameters:
+    model (nn.Module): Model with a single sigmoid output.
+    criterion (nn.Module): Loss function.
+    X (np.array or MemmapBatchLoader): Feature data, or an unshuffled
+        loader.
+    y (np.array or pd.Series): Target data (default is the labels of the
+        loader).
+
+    Returns:
+    float: Loss over all rows.
+    """
+    probs = predict_proba(model, X)
+    if y is None:
+        y = X.labels()
+    labels = torch.as_tensor(np.asarray(y), dtype=torch.float32)
+    return criterion(torch.from_numpy(probs), labels).item()
+
+
+def train_fnn(model, criterion, optimizer, dataloader, num_epochs=10,
+              verbose=False, checkpoint_path=None, checkpoint_every=1,
+              val_data=None, patience=None, min_delta=0.0,
+              restore_best=True, distributed=False):
     """
     Train the FNN model.
 
@@ -241,218 +878,1621 @@ def train_fnn(model, criterion, optimizer, dataloader, num_epochs=10):
     model (FNN): FNN model.
     criterion (nn.Module): Loss function.
     optimizer (optim.Optimizer): Optimizer.
-    dataloader (torch.utils.data.DataLoader): DataLoader for training data.
-    num_epochs (int): Number of training epochs.
+    dataloader (TensorBatchLoader or torch.utils.data.DataLoader): Loader
+        for training data.
+    num_epochs (int): Maximum number of training epochs.
+    verbose (bool): Print the metrics of every epoch.
+    checkpoint_path (str): File the model, optimizer and RNG states are
+        saved to; training resumes from it when it exists for the same
+        model shape. In distributed training only the first process writes
+        it, with the torch RNG state of every process.
+    checkpoint_every (int): Number of epochs between checkpoints.
+    val_data (tuple): Validation features and targets, as accepted by
+        validation_loss, evaluated after every epoch.
+    patience (int): Stop after this many epochs without improvement of the
+        validation loss (of the training loss without val_data), or None
+        to always train num_epochs.
+    min_delta (float): Minimum decrease of the loss that counts as an
+        improvement.
+    restore_best (bool): With patience, finish with the weights of the
+        epoch with the lowest loss.
+    distributed (bool): dataloader yields this process's shards of the
+        batches; the gradients of all processes are averaged before every
+        optimizer step (see train_fnn_data_parallel).
+
+    Returns:
+    list of dict: Epoch number, mean training loss and validation loss (if
+    val_data is given) per epoch.
     """
-    model.train()
-    for epoch in range(num_epochs):
+    config = {name: tuple(value.shape)
+              for name, value in model.state_dict().items()}
+    config["version"] = CHECKPOINT_VERSION
+    config["learning_rate"] = optimizer.param_groups[0]["lr"]
+    config["batch_size"] = getattr(dataloader, "batch_size", None)
+    config["world_size"] = dist.get_world_size() if distributed else 1
+    rank = dist.get_rank() if distributed else 0
+    generator = getattr(dataloader, "generator", None)
+    history = []
+    stopper = EarlyStopping(patience, min_delta) if patience else None
+    state = load_checkpoint(checkpoint_path, config)
+    if state is not None:
+        model.load_state_dict(state["model"])
+        optimizer.load_state_dict(state["optimizer"])
+        torch.set_rng_state(state["processes"][rank]["rng_state"])
+        if generator is not None and state["generator_state"] is not None:
+            generator.set_state(state["generator_state"])
+        history = state["history"]
+        if stopper is not None and state["early_stopping"] is not None:
+            stopper.load_state_dict(state["early_stopping"])
+
+    for epoch in range(len(history), num_epochs):
+        if stopper is not None and stopper.should_stop:
+            break
+        model.train()
+        total_loss = 0.0
+        total_rows = 0
         for inputs, labels in dataloader:
             optimizer.zero_grad()  # Clear gradients
             outputs = model(inputs)  # Forward pass
-            loss = criterion(outputs.squeeze(), labels.float())  # Compute loss
+            loss = criterion(outputs.squeeze(-1),
+                             labels.float())  # Compute loss
             loss.backward()  # Backward pass (compute gradients)
+            batch_loss = loss.detach()
+            if distributed:
+                # Average gradients and loss over the shards of the batch
+                params = list(model.parameters())
+                grads = [torch.zeros_like(param) if param.grad is None
+                         else param.grad for param in params]
+                all_reduce_weighted(grads + [batch_loss], len(inputs))
+                for param, grad in zip(params, grads):
+                    param.grad = grad
             optimizer.step()  # Update weights
-        print(f'Epoch [{epoch+1}/{num_epochs}], Loss: {loss.item():.4f}')
-
-
-def prepare_dataloader(X, y, batch_size=32):
+            total_loss += batch_loss.item() * len(inputs)
+            total_rows += len(inputs)
+
+        train_loss = total_loss / max(total_rows, 1)
+        if distributed:
+            train_loss = all_reduce_weighted(
+                [torch.tensor(train_loss)], total_rows)[0].item()
+        metrics = {"epoch": epoch + 1, "train_loss": train_loss}
+        if val_data is not None:
+            metrics["val_loss"] = validation_loss(model, criterion,
+                                                  *val_data)
+        history.append(metrics)
+        if verbose:
+            print(', '.join([f'Epoch [{epoch + 1}/{num_epochs}]'] +
+                            [f'{name}: {value:.4f}' for name, value in
+                             metrics.items() if name != 'epoch']))
+        if stopper is not None:
+            stopper.step(metrics.get("val_loss", metrics["train_loss"]),
+                         model, epoch + 1)
+
+        if checkpoint_path is not None and (
+                (epoch + 1) % checkpoint_every == 0 or
+                epoch + 1 == num_epochs or
+                (stopper is not None and stopper.should_stop)):
+            processes = gather_process_states(
+                {"rng_state": torch.get_rng_state()}, distributed)
+            if rank == 0:
+                save_checkpoint(checkpoint_path, {
+                    "config": config, "model": model.state_dict(),
+                    "optimizer": optimizer.state_dict(), "history": history,
+                    "early_stopping": None if stopper is None else
+                    stopper.state_dict(),
+                    "processes": processes,
+                    "generator_state": None if generator is None else
+                    generator.get_state()})
+
+    if stopper is not None and restore_best:
+        stopper.restore_best(model)
+    return history
+
+
+def prepare_dataloader(X, y, batch_size=32, shuffle=True,
+                       use_torch_dataloader=False):
     """
-    Prepare data for PyTorch DataLoader.
+    Prepare minibatches of the data for training or evaluation.
 
     Parameters:
     X (np.array): Feature data.
     y (np.array or pd.Series): Target data.
     batch_size (int): Batch size.
+    shuffle (bool): Shuffle the rows every epoch.
+    use_torch_dataloader (bool): Return a torch.utils.data.DataLoader
+        instead of a TensorBatchLoader.
 
     Returns:
-    torch.utils.data.DataLoader: DataLoader for the data.
+    TensorBatchLoader or torch.utils.data.DataLoader: Loader for the data.
     """
     # Convert pandas Series to numpy array if necessary
     if isinstance(y, pd.Series):
         y = y.values
-    dataset = torch.utils.data.TensorDataset(torch.from_numpy(X).float(),
-                                             torch.from_numpy(y).float())
-    return torch.utils.data.DataLoader(dataset, batch_size=batch_size,
-                                       shuffle=True)
-
-# Grid search over different n_hidden values with K-Fold Cross-Validation
-n_hidden_values = [32, 64, 128, 256, 512]
-kf = KFold(n_splits=5, shuffle=True, random_state=42)
-val_accuracies = {n_hidden: [] for n_hidden in n_hidden_values}
-
-# Perform K-Fold Cross-Validation
-for n_hidden in n_hidden_values:
-    for train_index, val_index in kf.split(X_train_scaled, y_train):
-        X_train_fold = X_train_scaled[train_index]
-        X_val_fold = X_train_scaled[val_index]
-        y_train_fold = y_train.iloc[train_index]
-        y_val_fold = y_train.iloc[val_index]
-
-        rbm = RBM(n_visible=X_train_scaled.shape[1], n_hidden=n_hidden)
-        rbm.train(torch.from_numpy(X_train_fold).float(), epochs=10)
-
-        X_train_rbm = extract_features(X_train_fold, rbm)
-        X_val_rbm = extract_features(X_val_fold, rbm)
-
-        train_loader_rbm = prepare_dataloader(X_train_rbm, y_train_fold)
-        val_loader_rbm = prepare_dataloader(X_val_rbm, y_val_fold)
-
-        fnn = FNN(input_dim=n_hidden)
-        criterion = nn.BCELoss()
-        optimizer = optim.Adam(fnn.parameters(), lr=0.001)
+    X = torch.from_numpy(np.asarray(X)).float()
+    y = torch.from_numpy(np.asarray(y)).float()
+    if use_torch_dataloader:
+        dataset = torch.utils.data.TensorDataset(X, y)
+        return torch.utils.data.DataLoader(dataset, batch_size=batch_size,
+                                           shuffle=shuffle)
+    return TensorBatchLoader(X, y, batch_size=batch_size, shuffle=shuffle)
+
+
+def benchmark_batch_loading(n_samples_list=(10000, 100000), n_features=134,
+                            batch_size=32, epochs=1):
+    """
+    Compare epoch time of DataLoader and TensorBatchLoader in train_fnn.
 
-        train_fnn(fnn, criterion, optimizer, train_loader_rbm, num_epochs=10)
+    Parameters:
+    n_samples_list (tuple): Numbers of synthetic training rows to time.
+    n_features (int): Number of input features.
+    batch_size (int): Batch size.
+    epochs (int): Number of epochs to time.
+
+    Returns:
+    dict: Seconds per epoch for each loader, keyed by number of rows.
+    """
+    results = {}
+    for n_samples in n_samples_list:
+        X = np.random.randn(n_samples, n_features).astype(np.float32)
+        y = (X[:, 0] > 0).astype(np.float32)
+        timings = {}
+        for name, use_torch_dataloader in (("dataloader", True),
+                                           ("tensor", False)):
+            loader = prepare_dataloader(
+                X, y, batch_size=batch_size,
+                use_torch_dataloader=use_torch_dataloader)
+            fnn = FNN(input_dim=n_features)
+            optimizer = optim.Adam(fnn.parameters(), lr=0.001)
+            start = time.perf_counter()
+            train_fnn(fnn, nn.BCELoss(), optimizer, loader,
+                      num_epochs=epochs, verbose=False)
+            timings[name] = (time.perf_counter() - start) / epochs
+        print(f'{n_samples} rows: DataLoader {timings["dataloader"]:.2f} '
+              f's/epoch, TensorBatchLoader {timings["tensor"]:.2f} s/epoch')
+        results[n_samples] = timings
+    return results
+
+
+def build_feature_matrix(dataset_path, output_path, label_column='is_adhd',
+                         block_size=65536):
+    """
+    Write the features of a binary dataset as a memory-mappable matrix.
+
+    The columns are copied block by block into a row-major float32 .npy
+    file, so the dataset never has to fit in memory.
+
+    Parameters:
+    dataset_path (str): Binary dataset directory written by save_dataset.
+    output_path (str): Path of the .npy feature matrix.
+    label_column (str): Name of the target column.
+    block_size (int): Number of rows copied at a time.
+
+    Returns:
+    tuple: Read-only memory-mapped feature matrix and the labels.
+    """
+    columns = open_dataset_columns(dataset_path)
+    labels = np.asarray(columns.pop(label_column))
+    features = list(columns.values())
+    X = np.lib.format.open_memmap(output_path, mode='w+', dtype=np.float32,
+                                  shape=(len(labels), len(features)))
+    for start in range(0, len(labels), block_size):
+        stop = min(start + block_size, len(labels))
+        for j, column in enumerate(features):
+            X[start:stop, j] = column[start:stop]
+    X.flush()
+    del X
+    return np.load(output_path, mmap_mode='r'), labels
+
+
+def fit_memmap_scaler(X, index, block_size=65536):
+    """
+    Fit a StandardScaler on selected rows of a feature matrix in blocks.
+
+    Parameters:
+    X (np.array): Unscaled features, typically memory-mapped.
+    index (np.array): Rows to fit the scaler on.
+    block_size (int): Number of rows read at a time.
+
+    Returns:
+    StandardScaler: Scaler fitted on the selected rows.
+    """
+    index = np.sort(index)
+    scaler = StandardScaler()
+    for start in range(0, len(index), block_size):
+        scaler.partial_fit(X[index[start:start + block_size]])
+    return scaler
+
+
+def rbm_feature_transform(rbm, mean_field=False):
+    """
+    Build a per-batch transform computing RBM features of scaled rows.
+
+    Parameters:
+    rbm (RBM): Trained RBM model.
+    mean_field (bool): Return the hidden probabilities instead of Bernoulli
+        samples.
 
-        # Evaluate on validation set
-        fnn.eval()
-        val_preds = []
-        val_labels = []
+    Returns:
+    function: Maps a batch of visible rows to hidden features.
+    """
+    def transform(v):
         with torch.no_grad():
-            for inputs, labels in val_loader_rbm:
-                outputs = fnn(inputs)
-                preds = outputs.squeeze().round()
-                val_preds.extend(preds.numpy())
-                val_labels.extend(labels.numpy())
+            h_prob = rbm.hidden_probs(v)
+            return h_prob if mean_field else torch.bernoulli(h_prob)
+    return transform
+
+
+def _memmap_source(X):
+    """
+    Describe how another process can reopen a memory-mapped array.
+
+    Only a whole mapping can be reopened from its file: slices and other
+    views of a np.memmap keep the file name and offset of the mapping they
+    were taken from, so they are not described.
+
+    Parameters:
+    X (np.array): Array to describe.
+
+    Returns:
+    dict: File name, dtype, offset, shape and order of X, or None if X is
+    not a whole memory mapping.
+    """
+    if (not isinstance(X, np.memmap) or X.filename is None or
+            not isinstance(X.base, mmap.mmap)):
+        return None
+    order = 'F' if X.flags.f_contiguous and not X.flags.c_contiguous else 'C'
+    return {"filename": X.filename, "dtype": X.dtype.str,
+            "offset": X.offset, "shape": X.shape, "order": order}
+
+
+def _open_memmap_source(source):
+    """
+    Reopen an array described by _memmap_source read-only.
+
+    Parameters:
+    source (dict): Result of _memmap_source.
+
+    Returns:
+    np.memmap: The memory-mapped array.
+    """
+    return np.memmap(source["filename"], dtype=source["dtype"], mode='r',
+                     offset=source["offset"], shape=source["shape"],
+                     order=source["order"])
+
+
+def _worker_data(X):
+    """
+    Prepare an array to be sent to worker processes.
+
+    Parameters:
+    X (np.array): Array, possibly memory-mapped.
+
+    Returns:
+    dict or np.array: The _memmap_source of a whole memory mapping, which
+    the workers reopen instead of receiving a copy, or else the array
+    itself.
+    """
+    source = _memmap_source(X)
+    return np.asarray(X) if source is None else source
+
+
+class MemmapBatchLoader:
+    """
+    Minibatch iterator over selected rows of a memory-mapped feature matrix.
+
+    Only the rows of the current batch are read and scaled, and RBM features
+    can be computed per batch, so the scaled data, the fold copies and the
+    feature matrices are never held in memory.
+    """
+
+    def __init__(self, X, y, index=None, batch_size=32, shuffle=True,
+                 scaler=None, transform=None, num_shards=1, shard_index=0,
+                 generator=None):
+        """
+        Parameters:
+        X (np.array): Unscaled features, typically memory-mapped.
+        y (np.array or pd.Series): Target data for every row of X, or None
+            to yield None targets.
+        index (np.array): Rows to iterate over (default is all rows).
+        batch_size (int): Batch size.
+        shuffle (bool): Shuffle the rows at the start of every epoch.
+        scaler (StandardScaler): Fitted scaler applied to every batch.
+        transform (function): Applied to every scaled batch, e.g. the
+            result of rbm_feature_transform.
+        num_shards (int): Number of data-parallel processes sharing every
+            batch.
+        shard_index (int): Shard of every batch yielded by this loader.
+        generator (torch.Generator): Generator of the shuffling order; data-
+            parallel processes use equally seeded generators so that they
+            agree on the batches.
+        """
+        self.X = X
+        self.y = None if y is None else np.asarray(y)
+        # Sorted so that unshuffled passes read the file sequentially
+        self.index = (np.arange(len(X)) if index is None
+                      else np.sort(index))
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.transform = transform
+        self.num_shards = num_shards
+        self.shard_index = shard_index
+        self.generator = generator
+        self.mean = self.scale = None
+        if scaler is not None:
+            self.mean = scaler.mean_.astype(np.float32)
+            self.scale = scaler.scale_.astype(np.float32)
+
+    def __len__(self):
+        return -(-len(self.index) // self.batch_size)
+
+    def labels(self):
+        """
+        Return the targets in the order of an unshuffled pass.
+        """
+        return self.y[self.index]
+
+    def __iter__(self):
+        index = self.index
+        if self.shuffle:
+            index = index[torch.randperm(
+                len(index), generator=self.generator).numpy()]
+        for start in range(0, len(index), self.batch_size):
+            rows = index[start:start + self.batch_size]
+            if self.num_shards > 1:
+                rows = rows[self.shard_index::self.num_shards]
+            if self.shuffle:
+                rows = np.sort(rows)
+            batch = np.array(self.X[rows], dtype=np.float32)
+            if self.mean is not None:
+                batch -= self.mean
+                batch /= self.scale
+            inputs = torch.from_numpy(batch)
+            if self.transform is not None:
+                inputs = self.transform(inputs)
+            if self.y is None:
+                yield inputs, None
+            else:
+                yield inputs, torch.from_numpy(
+                    self.y[rows].astype(np.float32))
+
+
+def predict_proba(model, X, batch_size=65536):
+    """
+    Predict probabilities for a whole split in batched forward passes.
+
+    Parameters:
+    model (nn.Module): Trained model with a single sigmoid output.
+    X (np.array or MemmapBatchLoader): Feature data, or an unshuffled
+        loader whose batch size replaces batch_size.
+    batch_size (int): Number of rows per forward pass.
+
+    Returns:
+    np.array: Predicted probabilities as float32, one per row.
+    """
+    if isinstance(X, MemmapBatchLoader):
+        batches = (inputs for inputs, _ in X)
+        probs = np.empty(len(X.index), dtype=np.float32)
+    else:
+        batches = (torch.as_tensor(np.asarray(X[start:start + batch_size]),
+                                   dtype=torch.float32)
+                   for start in range(0, len(X), batch_size))
+        probs = np.empty(len(X), dtype=np.float32)
+    model.eval()
+    start = 0
+    with torch.inference_mode():
+        for inputs in batches:
+            probs[start:start + len(inputs)] = (
+                model(inputs).reshape(-1).numpy())
+            start += len(inputs)
+    return probs
+
+
+def evaluate_model(model, X, y=None, batch_size=65536):
+    """
+    Evaluate a binary classifier on a whole split.
+
+    All metrics are derived from one descending sort of the scores: the
+    cumulative true and false positive counts give the ROC curve and AUC,
+    and their value at the 0.5 threshold gives the confusion matrix.
+
+    Parameters:
+    model (nn.Module): Trained model with a single sigmoid output.
+    X (np.array or MemmapBatchLoader): Feature data, or an unshuffled
+        loader.
+    y (np.array or pd.Series): Binary target data (default is the labels
+        of the loader).
+    batch_size (int): Number of rows per forward pass.
 
-        val_acc = accuracy_score(val_labels, val_preds)
+    Returns:
+    dict: accuracy, precision, recall, f1 and auc, the ROC curve as fpr,
+        tpr and thresholds, and the confusion_matrix as
+        [[tn, fp], [fn, tp]].
+    """
+    probs = predict_proba(model, X, batch_size=batch_size)
+    if y is None:
+        y = X.labels()
+    labels = np.asarray(y).astype(bool)
+
+    order = np.argsort(-probs, kind='stable')
+    scores = probs[order]
+    tps = np.cumsum(labels[order], dtype=np.int64)
+    fps = np.arange(1, len(scores) + 1) - tps
+    positives = int(tps[-1]) if len(tps) else 0
+    negatives = len(labels) - positives
+
+    # One ROC point per distinct score, i.e. after the last tied row
+    distinct = np.r_[np.flatnonzero(np.diff(scores)), len(scores) - 1]
+    tpr = np.r_[0, tps[distinct]] / max(positives, 1)
+    fpr = np.r_[0, fps[distinct]] / max(negatives, 1)
+    thresholds = np.r_[np.inf, scores[distinct]]
+    auc = (float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1])) / 2)
+           if positives and negatives else np.nan)
+
+    # Predictions are rounded probabilities, so 0.5 counts as negative
+    n_predicted = int(np.searchsorted(-scores, -0.5, side='left'))
+    tp = int(tps[n_predicted - 1]) if n_predicted else 0
+    fp = n_predicted - tp
+    fn = positives - tp
+    tn = negatives - fp
+
+    return {
+        "accuracy": (tp + tn) / len(labels),
+        "precision": tp / n_predicted if n_predicted else 0.0,
+        "recall": tp / positives if positives else 0.0,
+        "f1": 2 * tp / (2 * tp + fp + fn) if tp + fp + fn else 0.0,
+        "auc": auc,
+        "fpr": fpr,
+        "tpr": tpr,
+        "thresholds": thresholds,
+        "confusion_matrix": np.array([[tn, fp], [fn, tp]]),
+    }
+
+
+def print_report(report, title):
+    """
+    Print the metrics of an evaluate_model report.
+
+    Parameters:
+    report (dict): Report returned by evaluate_model.
+    title (str): Heading printed above the metrics.
+    """
+    print(f"\n{title}")
+    print(f"Accuracy: {report['accuracy']:.2f}")
+    print(f"Precision: {report['precision']:.2f}")
+    print(f"Recall: {report['recall']:.2f}")
+    print(f"F1-score: {report['f1']:.2f}")
+    print(f"AUC: {report['auc']:.2f}")
+
+
+def _data_parallel_worker(rank, world_size, init_file, task, result_path):
+    """
+    Train one data-parallel process of train_rbm_data_parallel or
+    train_fnn_data_parallel.
+    """
+    torch.set_num_threads(task["torch_threads"])
+    dist.init_process_group('gloo', init_method=f'file://{init_file}',
+                            rank=rank, world_size=world_size)
+    try:
+        X = task["X"]
+        if isinstance(X, dict):
+            X = _open_memmap_source(X)
+        # Shared batch order, independent Gibbs sampling noise per process
+        generator = torch.Generator().manual_seed(task["seed"])
+        torch.manual_seed(task["seed"] * 1000003 + rank)
+
+        transform = None
+        if task["rbm_state"] is not None:
+            rbm = RBM(*task["rbm_state"]["W"].shape)
+            rbm.load_state_dict(task["rbm_state"])
+            transform = rbm_feature_transform(rbm, task["mean_field"])
+        loader = MemmapBatchLoader(X, task["y"], task["index"],
+                                   batch_size=task["batch_size"],
+                                   scaler=task["scaler"], transform=transform,
+                                   num_shards=world_size, shard_index=rank,
+                                   generator=generator)
+
+        train_kwargs = dict(task["train_kwargs"])
+        train_kwargs["verbose"] = (train_kwargs.get("verbose", False) and
+                                   rank == 0)
+        if task["val_index"] is not None:
+            # Every process evaluates the whole validation set, so they all
+            # take the same early-stopping decisions
+            train_kwargs["val_data"] = (MemmapBatchLoader(
+                X, task["y"], task["val_index"], batch_size=65536,
+                shuffle=False, scaler=task["scaler"], transform=transform),)
+
+        if task["kind"] == "rbm":
+            model = RBM(*task["model_state"]["W"].shape)
+            model.load_state_dict(task["model_state"])
+            history = model.train(loader, distributed=True, **train_kwargs)
+        else:
+            model = FNN(task["model_state"]["fc1.weight"].shape[1])
+            model.load_state_dict(task["model_state"])
+            optimizer = optim.Adam(model.parameters(),
+                                   lr=task["learning_rate"])
+            history = train_fnn(model, nn.BCELoss(), optimizer, loader,
+                                distributed=True, **train_kwargs)
+
+        if rank == 0:
+            torch.save({"model": model.state_dict(), "history": history},
+                       result_path)
+    finally:
+        dist.destroy_process_group()
+
+
+def _run_data_parallel(model, task, num_workers):
+    """
+    Run a data-parallel task and load the trained weights into model.
+    """
+    task["X"] = _worker_data(task["X"])
+    task["model_state"] = {name: value.detach().clone()
+                           for name, value in model.state_dict().items()}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        result_path = os.path.join(tmp_dir, 'result.pt')
+        torch.multiprocessing.spawn(
+            _data_parallel_worker,
+            args=(num_workers, os.path.join(tmp_dir, 'rendezvous'), task,
+                  result_path),
+            nprocs=num_workers, join=True)
+        result = torch.load(result_path)
+    model.load_state_dict(result["model"])
+    return result["history"]
+
+
+def train_rbm_data_parallel(rbm, X, num_workers=2, index=None, scaler=None,
+                            batch_size=1024, seed=0, torch_threads=1,
+                            **train_kwargs):
+    """
+    Train an RBM with data parallelism over local CPU processes.
+
+    Every process reads a shard of each batch and computes its CD updates;
+    the updates are averaged with a gloo all-reduce before every step, so
+    all processes hold the same weights. Results match RBM.train with the
+    same batches within the tolerance of the Gibbs sampling noise. Batches
+    should be large enough (thousands of rows) for the compute per shard to
+    outweigh the all-reduce.
+
+    Parameters:
+    rbm (RBM): Model to train; trained in place.
+    X (np.array): Training features, typically memory-mapped.
+    num_workers (int): Number of processes.
+    index (np.array): Rows of X to train on (default is all rows).
+    scaler (StandardScaler): Scale the rows per batch (see
+        MemmapBatchLoader), or None if X is already scaled.
+    batch_size (int): Global batch size, split across the processes.
+    seed (int): Seed of the batch order and the sampling noise.
+    torch_threads (int): Torch intra-op threads per process.
+    **train_kwargs: Further arguments of RBM.train, e.g. epochs; verbose
+        output is printed by the first process only.
+
+    Returns:
+    list of dict: Epoch number and mean reconstruction error per epoch.
+    """
+    task = {"kind": "rbm", "X": X, "y": None, "index": index,
+            "val_index": None,
+            "scaler": scaler, "rbm_state": None, "mean_field": False,
+            "batch_size": batch_size, "seed": seed,
+            "torch_threads": torch_threads, "train_kwargs": train_kwargs}
+    return _run_data_parallel(rbm, task, num_workers)
+
+
+def train_fnn_data_parallel(fnn, X, y, num_workers=2, index=None,
+                            val_index=None, scaler=None, rbm=None,
+                            mean_field=True, batch_size=1024,
+                            learning_rate=0.001, seed=0, torch_threads=1,
+                            **train_kwargs):
+    """
+    Train an FNN with data parallelism over local CPU processes.
+
+    Every process computes the gradients of a shard of each batch; the
+    gradients are averaged with a gloo all-reduce before every Adam step,
+    so all processes apply the same update. Results match train_fnn with
+    the same batches within floating-point tolerance.
+
+    Parameters:
+    fnn (FNN): Model to train; trained in place.
+    X (np.array): Training features, typically memory-mapped.
+    y (np.array or pd.Series): Target data for every row of X.
+    num_workers (int): Number of processes.
+    index (np.array): Rows of X to train on (default is all rows).
+    val_index (np.array): Rows of X whose loss is reported and used for
+        early stopping after every epoch (see val_data of train_fnn).
+    scaler (StandardScaler): Scale the rows per batch (see
+        MemmapBatchLoader), or None if X is already scaled.
+    rbm (RBM): If given, train on the RBM features of the rows.
+    mean_field (bool): Use hidden probabilities as RBM features.
+    batch_size (int): Global batch size, split across the processes.
+    learning_rate (float): Adam learning rate.
+    seed (int): Seed of the batch order.
+    torch_threads (int): Torch intra-op threads per process.
+    **train_kwargs: Further arguments of train_fnn, e.g. num_epochs;
+        verbose output is printed by the first process only.
+
+    Returns:
+    list of dict: Epoch number, mean training loss and validation loss (with
+    val_index) per epoch.
+    """
+    task = {"kind": "fnn", "X": X, "y": np.asarray(y), "index": index,
+            "val_index": val_index,
+            "scaler": scaler,
+            "rbm_state": None if rbm is None else rbm.state_dict(),
+            "mean_field": mean_field, "batch_size": batch_size,
+            "learning_rate": learning_rate, "seed": seed,
+            "torch_threads": torch_threads, "train_kwargs": train_kwargs}
+    return _run_data_parallel(fnn, task, num_workers)
+
+
+def benchmark_data_parallel(n_samples=200000, n_features=134, n_hidden=128,
+                            num_workers_list=(1, 2, 4), batch_size=4096,
+                            epochs=1):
+    """
+    Time data-parallel RBM and FNN training for several process counts.
+
+    Parameters:
+    n_samples (int): Number of synthetic training rows.
+    n_features (int): Number of input features.
+    n_hidden (int): Number of RBM hidden units.
+    num_workers_list (tuple): Process counts to time.
+    batch_size (int): Global batch size.
+    epochs (int): Number of epochs to time.
+
+    Returns:
+    dict: Seconds per epoch of RBM and FNN training per process count.
+    """
+    X = np.random.randn(n_samples, n_features).astype(np.float32)
+    y = (X[:, 0] > 0).astype(np.float32)
+    rbm_init = RBM(n_features, n_hidden).state_dict()
+    fnn_init = FNN(n_features).state_dict()
+    results = {}
+    for num_workers in num_workers_list:
+        rbm = RBM(n_features, n_hidden)
+        rbm.load_state_dict(rbm_init)
+        start = time.perf_counter()
+        train_rbm_data_parallel(rbm, X, num_workers, batch_size=batch_size,
+                                epochs=epochs)
+        rbm_time = (time.perf_counter() - start) / epochs
+
+        fnn = FNN(n_features)
+        fnn.load_state_dict(fnn_init)
+        start = time.perf_counter()
+        train_fnn_data_parallel(fnn, X, y, num_workers,
+                                batch_size=batch_size, num_epochs=epochs)
+        fnn_time = (time.perf_counter() - start) / epochs
+
+        print(f'{num_workers} processes: RBM {rbm_time:.2f} s/epoch, '
+              f'FNN {fnn_time:.2f} s/epoch')
+        results[num_workers] = {"rbm": rbm_time, "fnn": fnn_time}
+    return results
+
+
+class StackedFNN(nn.Module):
+    """
+    Several FNN models evaluated as one model with batched weight tensors.
+
+    Member m uses the weights W1[m], W2[m], W3[m]; inputs of members with a
+    smaller input dimension are zero-padded, which leaves the padded weights
+    without gradient, so every member trains exactly like an independent FNN.
+    """
+
+    def __init__(self, models, input_dim=None):
+        """
+        Stack the parameters of FNN models.
+
+        Parameters:
+        models (list of FNN): Models to stack, used as the initial weights.
+        input_dim (int): Padded input dimension (default is the largest).
+        """
+        super(StackedFNN, self).__init__()
+        self.input_dims = [model.fc1.in_features for model in models]
+        if input_dim is None:
+            input_dim = max(self.input_dims)
+        W1 = torch.zeros(len(models), input_dim, models[0].fc1.out_features)
+        for m, model in enumerate(models):
+            W1[m, :self.input_dims[m]] = model.fc1.weight.detach().t()
+        self.W1 = nn.Parameter(W1)
+        self.b1 = nn.Parameter(torch.stack(
+            [model.fc1.bias.detach() for model in models]))
+        self.W2 = nn.Parameter(torch.stack(
+            [model.fc2.weight.detach().t() for model in models]))
+        self.b2 = nn.Parameter(torch.stack(
+            [model.fc2.bias.detach() for model in models]))
+        self.W3 = nn.Parameter(torch.stack(
+            [model.fc3.weight.detach().t() for model in models]))
+        self.b3 = nn.Parameter(torch.stack(
+            [model.fc3.bias.detach() for model in models]))
+
+    def forward(self, x):
+        """
+        Forward pass of every member.
+
+        Parameters:
+        x (torch.Tensor): Inputs of shape (n_models, batch, input_dim).
+
+        Returns:
+        torch.Tensor: Outputs of shape (n_models, batch, 1).
+        """
+        x = torch.relu(torch.baddbmm(self.b1.unsqueeze(1), x, self.W1))
+        x = torch.relu(torch.baddbmm(self.b2.unsqueeze(1), x, self.W2))
+        return torch.sigmoid(torch.baddbmm(self.b3.unsqueeze(1), x, self.W3))
+
+    def unstack(self):
+        """
+        Copy the member weights back into independent FNN models.
+
+        Returns:
+        list of FNN: One trained FNN per member.
+        """
+        models = []
+        for m, input_dim in enumerate(self.input_dims):
+            model = FNN(input_dim)
+            with torch.no_grad():
+                model.fc1.weight.copy_(self.W1[m, :input_dim].t())
+                model.fc1.bias.copy_(self.b1[m])
+                model.fc2.weight.copy_(self.W2[m].t())
+                model.fc2.bias.copy_(self.b2[m])
+                model.fc3.weight.copy_(self.W3[m].t())
+                model.fc3.bias.copy_(self.b3[m])
+            models.append(model)
+        return models
+
+
+def train_stacked_fnns(X_list, y_list, num_epochs=10, learning_rate=0.001,
+                       batch_size=32):
+    """
+    Train one FNN per training set simultaneously as a StackedFNN.
+
+    Every member shuffles its own rows each epoch and sees batches of the
+    same size as with prepare_dataloader; members with fewer rows are masked
+    out of the trailing batches. Every member keeps its own Adam moments and
+    step count, and members without rows in a batch are not updated.
+
+    Parameters:
+    X_list (list of np.array): Training features of every model.
+    y_list (list of np.array or pd.Series): Training labels of every model.
+    num_epochs (int): Number of training epochs.
+    learning_rate (float): Adam learning rate.
+    batch_size (int): Batch size of every member.
+
+    Returns:
+    list of FNN: The trained models, in the order of X_list.
+    """
+    num_models = len(X_list)
+    sizes = [len(X) for X in X_list]
+    max_rows = max(sizes)
+    input_dim = max(X.shape[1] for X in X_list)
+
+    X_pad = torch.zeros(num_models, max_rows, input_dim)
+    y_pad = torch.zeros(num_models, max_rows)
+    for m, (X, y) in enumerate(zip(X_list, y_list)):
+        X_pad[m, :sizes[m], :X.shape[1]] = torch.as_tensor(
+            X, dtype=torch.float32)
+        y_pad[m, :sizes[m]] = torch.as_tensor(np.asarray(y),
+                                              dtype=torch.float32)
+
+    stacked = StackedFNN([FNN(X.shape[1]) for X in X_list], input_dim)
+    params = list(stacked.parameters())
+    # Adam moments and step count per member, so a member masked out of a
+    # whole batch skips that update like an independent FNN would
+    exp_avgs = [torch.zeros_like(param) for param in params]
+    exp_avg_sqs = [torch.zeros_like(param) for param in params]
+    steps = torch.zeros(num_models, dtype=torch.float64)
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+    members = torch.arange(num_models).unsqueeze(1)
+    size_tensor = torch.tensor(sizes).unsqueeze(1)
+
+    stacked.train()
+    for epoch in range(num_epochs):
+        order = torch.zeros(num_models, max_rows, dtype=torch.long)
+        for m, size in enumerate(sizes):
+            order[m, :size] = torch.randperm(size)
+        for start in range(0, max_rows, batch_size):
+            positions = torch.arange(start, min(start + batch_size, max_rows))
+            mask = (positions.unsqueeze(0) < size_tensor).float()
+            rows = order[:, positions]
+            inputs = X_pad[members, rows]
+            labels = y_pad[members, rows]
+
+            stacked.zero_grad()
+            outputs = stacked(inputs).squeeze(-1)
+            losses = nn.functional.binary_cross_entropy(
+                outputs, labels, reduction='none')
+            # Per-member mean over its own rows; members are independent,
+            # so summing keeps every member's gradient unchanged
+            loss = ((losses * mask).sum(dim=1) /
+                    mask.sum(dim=1).clamp(min=1)).sum()
+            loss.backward()
+
+            active = mask.sum(dim=1) > 0
+            steps += active
+            bias_correction1 = 1 - beta1 ** steps.clamp(min=1)
+            bias_correction2 = 1 - beta2 ** steps.clamp(min=1)
+            with torch.no_grad():
+                for param, exp_avg, exp_avg_sq in zip(params, exp_avgs,
+                                                      exp_avg_sqs):
+                    shape = (num_models,) + (1,) * (param.dim() - 1)
+                    member_active = active.view(shape)
+                    grad = param.grad
+                    exp_avg.copy_(torch.where(
+                        member_active, exp_avg.lerp(grad, 1 - beta1),
+                        exp_avg))
+                    exp_avg_sq.copy_(torch.where(
+                        member_active,
+                        exp_avg_sq * beta2 + grad * grad * (1 - beta2),
+                        exp_avg_sq))
+                    denom = (exp_avg_sq.sqrt() / bias_correction2.sqrt().view(
+                        shape).float()) + eps
+                    step_size = (learning_rate / bias_correction1).view(
+                        shape).float()
+                    update = step_size * exp_avg / denom
+                    param.sub_(torch.where(member_active, update,
+                                           torch.zeros_like(update)))
+    return stacked.unstack()
+
+
+def run_grid_trial(X, y, n_hidden, fold, train_index, val_index,
+                   mean_field_features=True, seed=0, rbm_epochs=10,
+                   rbm_learning_rate=0.1, rbm_batch_size=10, fnn_epochs=10,
+                   fnn_learning_rate=0.001, fnn_batch_size=32, scaler=None,
+                   feature_store=None, checkpoint_prefix=None,
+                   rbm_patience=None, fnn_patience=None,
+                   early_stopping_fraction=0.1):
+    """
+    Train and validate one RBM + FNN for an n_hidden value and a fold.
+
+    Parameters:
+    X (np.array): Scaled training features.
+    y (np.array): Training labels.
+    n_hidden (int): Number of hidden units of the RBM.
+    fold (int): Fold number.
+    train_index (np.array): Row indices of the fold's training rows.
+    val_index (np.array): Row indices of the fold's validation rows.
+    mean_field_features (bool): Use hidden probabilities as RBM features.
+    seed (int): Base seed; each trial seeds torch from it, n_hidden and fold.
+    rbm_epochs (int): Number of RBM training epochs.
+    rbm_learning_rate (float): RBM learning rate.
+    rbm_batch_size (int): RBM batch size.
+    fnn_epochs (int): Number of FNN training epochs.
+    fnn_learning_rate (float): FNN learning rate.
+    fnn_batch_size (int): FNN batch size.
+    scaler (StandardScaler): If given, X holds unscaled (e.g. memory-mapped)
+        rows that are read, scaled and passed through the RBM per batch
+        instead of being copied for the fold.
+    feature_store (FeatureStore): Store to load and save the RBM features.
+    checkpoint_prefix (str): Path prefix of the RBM and FNN checkpoints of
+        the trial, or None to train without checkpoints.
+    rbm_patience (int): Stop RBM training once the reconstruction error has
+        not improved for this many epochs.
+    fnn_patience (int): Stop FNN training once the loss on a held-out part
+        of the training fold has not improved for this many epochs.
+    early_stopping_fraction (float): Fraction of the training fold held out
+        for FNN early stopping.
+
+    Returns:
+    dict: n_hidden, fold, validation accuracy, wall time and the per-epoch
+    RBM and FNN histories of the trial.
+    """
+    start = time.perf_counter()
+    torch.manual_seed(seed * 1000003 + n_hidden * 101 + fold)
+    rbm = RBM(n_visible=X.shape[1], n_hidden=n_hidden)
+    rbm_checkpoint = fnn_checkpoint = None
+    if checkpoint_prefix is not None:
+        rbm_checkpoint = f'{checkpoint_prefix}_rbm.pt'
+        fnn_checkpoint = f'{checkpoint_prefix}_fnn.pt'
+
+    # Positions within the training fold that the FNN is early-stopped on
+    fit_pos = stop_pos = None
+    if fnn_patience:
+        fit_pos, stop_pos = train_test_split(
+            np.arange(len(train_index)), test_size=early_stopping_fraction,
+            random_state=fold, stratify=y[train_index])
+
+    if scaler is None:
+        X_train_fold = X[train_index]
+        X_val_fold = X[val_index]
+        y_train_fold = y[train_index]
+        y_val_fold = y[val_index]
+
+        rbm_history = rbm.train(
+            torch.from_numpy(X_train_fold).float(), epochs=rbm_epochs,
+            learning_rate=rbm_learning_rate, batch_size=rbm_batch_size,
+            checkpoint_path=rbm_checkpoint, patience=rbm_patience)
+
+        X_train_rbm = extract_rbm_features(X_train_fold, rbm,
+                                           mean_field_features, feature_store)
+        X_val_rbm = extract_rbm_features(X_val_fold, rbm, mean_field_features,
+                                         feature_store)
+
+        stop_data = None
+        if stop_pos is not None:
+            stop_data = (X_train_rbm[stop_pos], y_train_fold[stop_pos])
+            X_train_rbm = X_train_rbm[fit_pos]
+            y_train_fold = y_train_fold[fit_pos]
+        train_loader_rbm = prepare_dataloader(X_train_rbm, y_train_fold,
+                                              batch_size=fnn_batch_size)
+    else:
+        rbm_history = rbm.train(
+            MemmapBatchLoader(X, y, train_index, batch_size=rbm_batch_size,
+                              scaler=scaler),
+            epochs=rbm_epochs, learning_rate=rbm_learning_rate,
+            checkpoint_path=rbm_checkpoint, patience=rbm_patience)
+
+        transform = rbm_feature_transform(rbm, mean_field_features)
+        stop_data = None
+        fit_index = train_index
+        if stop_pos is not None:
+            stop_data = (MemmapBatchLoader(X, y, train_index[stop_pos],
+                                           batch_size=65536, shuffle=False,
+                                           scaler=scaler,
+                                           transform=transform),)
+            fit_index = train_index[fit_pos]
+        train_loader_rbm = MemmapBatchLoader(X, y, fit_index,
+                                             batch_size=fnn_batch_size,
+                                             scaler=scaler,
+                                             transform=transform)
+        X_val_rbm = MemmapBatchLoader(X, y, val_index, batch_size=65536,
+                                      shuffle=False, scaler=scaler,
+                                      transform=transform)
+        y_val_fold = None
+
+    fnn = FNN(input_dim=n_hidden)
+    criterion = nn.BCELoss()
+    optimizer = optim.Adam(fnn.parameters(), lr=fnn_learning_rate)
+
+    fnn_history = train_fnn(fnn, criterion, optimizer, train_loader_rbm,
+                            num_epochs=fnn_epochs,
+                            checkpoint_path=fnn_checkpoint,
+                            val_data=stop_data, patience=fnn_patience)
+
+    # Evaluate on validation set
+    report = evaluate_model(fnn, X_val_rbm, y_val_fold)
+
+    return {"n_hidden": n_hidden, "fold": fold,
+            "val_accuracy": report["accuracy"],
+            "wall_time": time.perf_counter() - start,
+            "rbm_history": rbm_history, "fnn_history": fnn_history}
+
+
+_grid_worker_data = {}
+
+
+def _init_grid_worker(X, y, torch_threads):
+    """
+    Store the training data and limit torch threads in a worker process.
+    """
+    torch.set_num_threads(torch_threads)
+    if isinstance(X, dict):
+        X = _open_memmap_source(X)
+    _grid_worker_data["X"] = X
+    _grid_worker_data["y"] = y
+
+
+def _run_grid_worker_trial(trial_kwargs):
+    return run_grid_trial(_grid_worker_data["X"], _grid_worker_data["y"],
+                          **trial_kwargs)
+
+
+def data_content_hash(X, y, block_rows=65536):
+    """
+    Hash the features and labels a grid search is run on.
+
+    Parameters:
+    X (np.array): Training features, possibly memory-mapped.
+    y (np.array or pd.Series): Training labels.
+    block_rows (int): Number of rows hashed at a time.
+
+    Returns:
+    str: Hexadecimal digest of the data.
+    """
+    digest = hashlib.sha256()
+    for array in (X, np.asarray(y)):
+        digest.update(str((array.shape, array.dtype.str)).encode())
+        for start in range(0, len(array), block_rows):
+            digest.update(np.ascontiguousarray(
+                array[start:start + block_rows]).data)
+    return digest.hexdigest()
+
+
+def trial_key(trial, data_key=''):
+    """
+    Identify a trial by its data, its scalar arguments and its fold indices.
+
+    Parameters:
+    trial (dict): Keyword arguments of run_grid_trial.
+    data_key (str): data_content_hash of the X and y the trial runs on.
+
+    Returns:
+    str: Hexadecimal key of the trial.
+    """
+    digest = hashlib.sha256()
+    digest.update(f'data={data_key}'.encode())
+    for name in sorted(trial):
+        value = trial[name]
+        if isinstance(value, np.ndarray):
+            digest.update(name.encode())
+            digest.update(np.ascontiguousarray(value, dtype=np.int64).data)
+        elif isinstance(value, (bool, int, float, str, np.number)):
+            digest.update(f'{name}={value!r}'.encode())
+    return digest.hexdigest()[:24]
+
+
+def load_completed_trials(log_path):
+    """
+    Read the records of completed trials from a trial log.
+
+    Parameters:
+    log_path (str): JSON-lines file written by run_trials.
+
+    Returns:
+    dict: Trial records keyed by trial_key.
+    """
+    completed = {}
+    if os.path.exists(log_path):
+        with open(log_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Line cut short by a crash while it was written
+                    continue
+                if entry.get("version") == CHECKPOINT_VERSION:
+                    completed[entry["key"]] = entry["record"]
+    return completed
+
+
+def run_trials(X, y, trials, num_workers=1, torch_threads=1,
+               checkpoint_dir=None):
+    """
+    Run run_grid_trial for every set of keyword arguments.
+
+    With a checkpoint_dir, every finished trial is appended to a log there
+    and skipped when the trials are run again on the same X and y, and
+    unfinished trials resume from their RBM and FNN checkpoints.
+
+    Parameters:
+    X (np.array): Training features; memory-mapped features are reopened
+        by the workers instead of being copied to them.
+    y (np.array): Training labels.
+    trials (list of dict): Keyword arguments of run_grid_trial.
+    num_workers (int): Number of worker processes running trials.
+    torch_threads (int): Torch intra-op threads per worker process.
+    checkpoint_dir (str): Directory for the trial log and checkpoints.
+
+    Returns:
+    list of dict: Trial records in the order of trials.
+    """
+    records = [None] * len(trials)
+    if checkpoint_dir is not None:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        log_path = os.path.join(checkpoint_dir, GRID_TRIALS_LOG)
+        completed = load_completed_trials(log_path)
+        data_key = data_content_hash(X, y)
+        keys = [trial_key(trial, data_key) for trial in trials]
+        trials = [dict(trial, checkpoint_prefix=os.path.join(
+            checkpoint_dir, f'trial_{key}')) for trial, key in
+            zip(trials, keys)]
+        for i, key in enumerate(keys):
+            records[i] = completed.get(key)
+
+    def finish(i, record):
+        records[i] = record
+        if checkpoint_dir is not None:
+            with open(log_path, 'a') as f:
+                f.write(json.dumps({"version": CHECKPOINT_VERSION,
+                                    "key": keys[i], "record": record},
+                                   default=lambda value: value.item()) +
+                        '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            for path in glob.glob(f'{trials[i]["checkpoint_prefix"]}_*.pt'):
+                os.remove(path)
+
+    pending = [i for i, record in enumerate(records) if record is None]
+    if num_workers <= 1:
+        for i in pending:
+            finish(i, run_grid_trial(X, y, **trials[i]))
+        return records
+    with ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_grid_worker,
+            initargs=(_worker_data(X), y, torch_threads)) as executor:
+        futures = {executor.submit(_run_grid_worker_trial, trials[i]): i
+                   for i in pending}
+        for future in as_completed(futures):
+            finish(futures[future], future.result())
+    return records
+
+
+def run_grid_search(X, y, n_hidden_values, n_splits=5, num_workers=1,
+                    torch_threads=1, mean_field_features=True, seed=0,
+                    scaler=None, index=None, feature_store=None,
+                    checkpoint_dir=None, rbm_patience=None,
+                    fnn_patience=None):
+    """
+    Run the n_hidden x K-fold grid search, optionally in a process pool.
+
+    Parameters:
+    X (np.array): Scaled training features.
+    y (np.array or pd.Series): Training labels.
+    n_hidden_values (list): n_hidden values to evaluate.
+    n_splits (int): Number of cross-validation folds.
+    num_workers (int): Number of worker processes running trials.
+    torch_threads (int): Torch intra-op threads per worker process.
+    mean_field_features (bool): Use hidden probabilities as RBM features.
+    seed (int): Base seed of the trials.
+    scaler (StandardScaler): Scale the rows of X per batch (see
+        run_grid_trial).
+    index (np.array): Rows of X to cross-validate (default is all rows).
+    feature_store (FeatureStore): Store to load and save the RBM features.
+    checkpoint_dir (str): Directory to resume completed and interrupted
+        trials from (see run_trials).
+    rbm_patience (int): RBM early-stopping patience (see run_grid_trial).
+    fnn_patience (int): FNN early-stopping patience (see run_grid_trial).
+
+    Returns:
+    tuple: Validation accuracies per n_hidden (in fold order) and the list
+    of trial records with their wall times.
+    """
+    if isinstance(y, pd.Series):
+        y = y.values
+    rows = np.arange(len(X)) if index is None else np.asarray(index)
+    kf = KFold(n_splits=n_splits, shuffle=True, random_state=42)
+    folds = [(rows[train_index], rows[val_index])
+             for train_index, val_index in kf.split(rows)]
+    trials = [{"n_hidden": n_hidden, "fold": fold,
+               "train_index": train_index, "val_index": val_index,
+               "mean_field_features": mean_field_features, "seed": seed,
+               "scaler": scaler, "feature_store": feature_store,
+               "rbm_patience": rbm_patience, "fnn_patience": fnn_patience}
+              for n_hidden in n_hidden_values
+              for fold, (train_index, val_index) in enumerate(folds)]
+    records = run_trials(X, y, trials, num_workers, torch_threads,
+                         checkpoint_dir)
+
+    val_accuracies = {n_hidden: [] for n_hidden in n_hidden_values}
+    for record in sorted(records, key=lambda r: (r["n_hidden"], r["fold"])):
+        val_accuracies[record["n_hidden"]].append(record["val_accuracy"])
+        print(f'n_hidden = {record["n_hidden"]}, '
+              f'Fold Validation Accuracy: {record["val_accuracy"]:.4f} '
+              f'({record["wall_time"]:.1f}s, '
+              f'{len(record["rbm_history"])} RBM / '
+              f'{len(record["fnn_history"])} FNN epochs)')
+    return val_accuracies, records
+
+
+def run_stacked_grid_search(X, y, n_hidden_values, n_splits=5,
+                            mean_field_features=True, seed=0,
+                            feature_store=None):
+    """
+    Run the n_hidden x K-fold grid search with all FNNs trained at once.
+
+    The RBMs are trained per (n_hidden, fold) as in run_grid_search; the
+    FNNs of every fold and n_hidden value are then trained together with
+    train_stacked_fnns.
+
+    Parameters:
+    X (np.array): Scaled training features.
+    y (np.array or pd.Series): Training labels.
+    n_hidden_values (list): n_hidden values to evaluate.
+    n_splits (int): Number of cross-validation folds.
+    mean_field_features (bool): Use hidden probabilities as RBM features.
+    seed (int): Random seed.
+    feature_store (FeatureStore): Store to load and save the RBM features.
+
+    Returns:
+    dict: Validation accuracies per n_hidden, in fold order.
+    """
+    if isinstance(y, pd.Series):
+        y = y.values
+    torch.manual_seed(seed)
+    kf = KFold(n_splits=n_splits, shuffle=True, random_state=42)
+    folds = list(kf.split(X, y))
+
+    trials = []
+    for n_hidden in n_hidden_values:
+        for train_index, val_index in folds:
+            rbm = RBM(n_visible=X.shape[1], n_hidden=n_hidden)
+            rbm.train(torch.from_numpy(X[train_index]).float(), epochs=10)
+            trials.append((n_hidden,
+                           extract_rbm_features(X[train_index], rbm,
+                                                mean_field_features,
+                                                feature_store),
+                           extract_rbm_features(X[val_index], rbm,
+                                                mean_field_features,
+                                                feature_store),
+                           train_index, val_index))
+
+    models = train_stacked_fnns([trial[1] for trial in trials],
+                                [y[trial[3]] for trial in trials])
+
+    val_accuracies = {n_hidden: [] for n_hidden in n_hidden_values}
+    for (n_hidden, _, X_val_rbm, _, val_index), fnn in zip(trials, models):
+        val_acc = evaluate_model(fnn, X_val_rbm, y[val_index])["accuracy"]
         val_accuracies[n_hidden].append(val_acc)
-        print(f'n_hidden = {n_hidden}, Fold Validation Accuracy: {val_acc:.4f}')
-
-# Average validation accuracies for each n_hidden value
-avg_val_accuracies = {n_hidden: np.mean(accs) for n_hidden, accs in
-                      val_accuracies.items()}
-
-# Plotting the results
-n_hidden_list = list(avg_val_accuracies.keys())
-avg_val_acc_list = list(avg_val_accuracies.values())
-
-plt.plot(n_hidden_list, avg_val_acc_list, marker='o')
-plt.xlabel('Number of Hidden Units (n_hidden)')
-plt.ylabel('Average Validation Accuracy')
-plt.title('Average Validation Accuracy vs. Number of Hidden Units in RBM')
-plt.grid(True)
-plt.show()
-
-# Find the optimal n_hidden value
-optimal_n_hidden = max(avg_val_accuracies, key=avg_val_accuracies.get)
-print(f'Optimal n_hidden value: {optimal_n_hidden}')
-
-# Final training on the full training set with the optimal n_hidden
-rbm = RBM(n_visible=X_train_scaled.shape[1], n_hidden=optimal_n_hidden)
-rbm.train(torch.from_numpy(X_train_scaled).float(), epochs=10)
-
-X_train_rbm = extract_features(X_train_scaled, rbm)
-X_test_rbm = extract_features(X_test_scaled, rbm)
-
-train_loader_rbm = prepare_dataloader(X_train_rbm, y_train)
-test_loader_rbm = prepare_dataloader(X_test_rbm, y_test)
-
-fnn = FNN(input_dim=optimal_n_hidden)
-criterion = nn.BCELoss()
-optimizer = optim.Adam(fnn.parameters(), lr=0.001)
-
-train_fnn(fnn, criterion, optimizer, train_loader_rbm, num_epochs=10)
-
-# Save the trained models and scaler
-torch.save(rbm.state_dict(), '/content/drive/MyDrive/Project_ADHD/'
-                             'rbm_model.pth')
-torch.save(fnn.state_dict(), '/content/drive/MyDrive/Project_ADHD/'
-                             'fnn_model.pth')
-joblib.dump(scaler, '/content/drive/MyDrive/Project_ADHD/scaler.pkl')
-
-print("Models and scaler saved successfully!")
-
-# Evaluate on the test set
-fnn.eval()
-test_preds = []
-test_labels = []
-test_probs = []  # For AUC calculation
-with torch.no_grad():
-    for inputs, labels in test_loader_rbm:
-        outputs = fnn(inputs)
-        preds = outputs.squeeze().round()
-        probs = outputs.squeeze()  # For AUC calculation
-        test_preds.extend(preds.numpy())
-        test_labels.extend(labels.numpy())
-        test_probs.extend(probs.numpy())
-
-test_acc = accuracy_score(test_labels, test_preds)
-test_precision = precision_score(test_labels, test_preds)
-test_recall = recall_score(test_labels, test_preds)
-test_f1 = f1_score(test_labels, test_preds)
-test_auc = roc_auc_score(test_labels, test_probs)
-
-print(f"\nTest Results with Optimal n_hidden = {optimal_n_hidden}:")
-print(f"Accuracy: {test_acc:.2f}")
-print(f"Precision: {test_precision:.2f}")
-print(f"Recall: {test_recall:.2f}")
-print(f"F1-score: {test_f1:.2f}")
-print(f"AUC: {test_auc:.2f}")
-
-# Plot ROC curve
-fpr, tpr, _ = roc_curve(test_labels, test_probs)
-plt.figure()
-plt.plot(fpr, tpr, color='darkorange', lw=2,
-         label='ROC curve (area = %0.2f)' % test_auc)
-plt.plot([0, 1], [0, 1], color='navy', lw=2, linestyle='--')
-plt.xlim([0.0, 1.0])
-plt.ylim([0.0, 1.05])
-plt.xlabel('False Positive Rate')
-plt.ylabel('True Positive Rate')
-plt.title('Receiver Operating Characteristic')
-plt.legend(loc="lower right")
-plt.show()
-
-# Plot confusion matrix
-cm = confusion_matrix(test_labels, test_preds)
-disp = ConfusionMatrixDisplay(confusion_matrix=cm)
-disp.plot(cmap=plt.cm.Blues)
-plt.title('Confusion Matrix')
-plt.show()
-
-# Compare the performance of models with RBM features and original features
-print("\nEvaluating on original features for comparison:")
-
-# Prepare original data for PyTorch
-train_loader_orig = prepare_dataloader(X_train_scaled, y_train)
-test_loader_orig = prepare_dataloader(X_test_scaled, y_test)
-
-# Train FNN on original features
-fnn_orig = FNN(input_dim=X_train_scaled.shape[1])
-criterion = nn.BCELoss()
-optimizer = optim.Adam(fnn_orig.parameters(), lr=0.001)
-
-train_fnn(fnn_orig, criterion, optimizer, train_loader_orig, num_epochs=10)
-
-# Evaluate on the test set with original features
-fnn_orig.eval()
-test_preds_orig = []
-test_labels_orig = []
-test_probs_orig = []  # For AUC calculation
-with torch.no_grad():
-    for inputs, labels in test_loader_orig:
-        outputs = fnn_orig(inputs)
-        preds = outputs.squeeze().round()
-        probs = outputs.squeeze()  # For AUC calculation
-        test_preds_orig.extend(preds.numpy())
-        test_labels_orig.extend(labels.numpy())
-        test_probs_orig.extend(probs.numpy())
-
-test_acc_orig = accuracy_score(test_labels_orig, test_preds_orig)
-test_precision_orig = precision_score(test_labels_orig, test_preds_orig)
-test_recall_orig = recall_score(test_labels_orig, test_preds_orig)
-test_f1_orig = f1_score(test_labels_orig, test_preds_orig)
-test_auc_orig = roc_auc_score(test_labels_orig, test_probs_orig)
-
-print(f"\nTest Results with Original Features:")
-print(f"Accuracy: {test_acc_orig:.2f}")
-print(f"Precision: {test_precision_orig:.2f}")
-print(f"Recall: {test_recall_orig:.2f}")
-print(f"F1-score: {test_f1_orig:.2f}")
-print(f"AUC: {test_auc_orig:.2f}")
-
-# Compare the performance of models with RBM features and original features
-if test_acc > test_acc_orig:
-    print("RBM generated features improve the performance of the model.")
-else:
-    print("RBM generated features do not improve the performance of the model.")
\ No newline at end of file
+        print(f'n_hidden = {n_hidden}, Fold Validation Accuracy: '
+              f'{val_acc:.4f}')
+    return val_accuracies
+
+
+# Search space of the successive-halving scheduler
+SEARCH_SPACE = {
+    "n_hidden": [32, 64, 128, 256, 512],
+    "rbm_learning_rate": [0.01, 0.03, 0.1],
+    "rbm_epochs": [5, 10, 20],
+    "fnn_learning_rate": [0.0003, 0.001, 0.003],
+    "fnn_epochs": [5, 10, 20],
+    "batch_size": [32, 64, 128, 256],
+}
+
+
+def sample_configurations(search_space, num_configs, seed=0):
+    """
+    Draw random configurations from a search space.
+
+    Parameters:
+    search_space (dict): Candidate values per hyperparameter.
+    num_configs (int): Number of configurations to draw.
+    seed (int): Random seed.
+
+    Returns:
+    list of dict: Distinct configurations (at most the size of the space).
+    """
+    rng = np.random.default_rng(seed)
+    names = list(search_space)
+    space_size = int(np.prod([len(search_space[name]) for name in names]))
+    configs = []
+    seen = set()
+    while len(configs) < min(num_configs, space_size):
+        config = {name: search_space[name][rng.integers(
+            len(search_space[name]))] for name in names}
+        key = tuple(config[name] for name in names)
+        if key not in seen:
+            seen.add(key)
+            configs.append(config)
+    return configs
+
+
+def successive_halving(X, y, configs, eta=3, num_rungs=3, num_folds=1,
+                       num_workers=1, torch_threads=1,
+                       mean_field_features=True, seed=0,
+                       checkpoint_dir=None):
+    """
+    Search configurations with successive halving over training epochs.
+
+    Every rung trains the remaining candidates with a fraction
+    eta ** (rung - num_rungs + 1) of their RBM and FNN epochs, keeps the best
+    1 / eta of them and promotes them to the next rung with eta times the
+    budget. The last rung trains the survivors with their full epochs.
+
+    Parameters:
+    X (np.array): Scaled training features.
+    y (np.array or pd.Series): Training labels.
+    configs (list of dict): Configurations with the SEARCH_SPACE keys.
+    eta (int): Reduction factor between rungs.
+    num_rungs (int): Number of rungs.
+    num_folds (int): Number of cross-validation folds evaluated per rung.
+    num_workers (int): Number of worker processes running trials.
+    torch_threads (int): Torch intra-op threads per worker process.
+    mean_field_features (bool): Use hidden probabilities as RBM features.
+    seed (int): Base seed of the trials.
+    checkpoint_dir (str): Directory to resume completed and interrupted
+        trials from (see run_trials).
+
+    Returns:
+    tuple: Best configuration and the list of trial records of all rungs.
+    """
+    if isinstance(y, pd.Series):
+        y = y.values
+    kf = KFold(n_splits=5, shuffle=True, random_state=42)
+    folds = list(kf.split(X, y))[:num_folds]
+
+    candidates = list(range(len(configs)))
+    history = []
+    for rung in range(num_rungs):
+        fraction = float(eta) ** (rung - num_rungs + 1)
+        trials = []
+        for candidate in candidates:
+            config = configs[candidate]
+            for fold, (train_index, val_index) in enumerate(folds):
+                trials.append({
+                    "n_hidden": config["n_hidden"], "fold": fold,
+                    "train_index": train_index, "val_index": val_index,
+                    "mean_field_features": mean_field_features,
+                    "seed": seed,
+                    "rbm_epochs": max(1, round(config["rbm_epochs"] *
+                                               fraction)),
+                    "rbm_learning_rate": config["rbm_learning_rate"],
+                    "rbm_batch_size": config["batch_size"],
+                    "fnn_epochs": max(1, round(config["fnn_epochs"] *
+                                               fraction)),
+                    "fnn_learning_rate": config["fnn_learning_rate"],
+                    "fnn_batch_size": config["batch_size"]})
+        records = run_trials(X, y, trials, num_workers, torch_threads,
+                             checkpoint_dir)
+
+        scores = {}
+        for trial_index, record in enumerate(records):
+            candidate = candidates[trial_index // len(folds)]
+            record.update({"rung": rung, "config_index": candidate,
+                           "budget_fraction": fraction})
+            scores.setdefault(candidate, []).append(record["val_accuracy"])
+            history.append(record)
+        ranked = sorted(candidates, key=lambda c: -np.mean(scores[c]))
+        print(f'Rung {rung + 1}/{num_rungs}: {len(candidates)} candidates, '
+              f'budget {fraction:.2f}, best accuracy '
+              f'{np.mean(scores[ranked[0]]):.4f}')
+        if rung < num_rungs - 1:
+            candidates = ranked[:max(1, int(np.ceil(len(candidates) / eta)))]
+
+    return configs[ranked[0]], history
+
+
+def main(dataset_path='/content/drive/MyDrive/Project_ADHD/student_data_ADHD',
+         output_dir='/content/drive/MyDrive/Project_ADHD',
+         checkpoint_dir='/content/checkpoints'):
+    """
+    Main function to load data, run the grid search, train the final RBM and
+    FNN, and compare them with an FNN on the original features.
+
+    Parameters:
+    dataset_path (str): Binary dataset directory written by part 1.
+    output_dir (str): Directory for the saved models, scaler and plots.
+    checkpoint_dir (str): Local directory for training checkpoints and
+        completed grid-search trials; a restarted run resumes from it
+        instead of redoing work.
+    """
+    # Read the features from a memory-mapped matrix and scale them per batch
+    # instead of loading the dataset, for datasets larger than memory
+    memmap_training = False
+
+    if memmap_training:
+        X, y = build_feature_matrix(dataset_path,
+                                    '/content/student_features.npy')
+
+        # Initial train/test split by row index, without copying rows
+        train_index, test_index = train_test_split(
+            np.arange(len(y)), test_size=0.2, random_state=42, stratify=y)
+
+        # Normalize numerical features per batch
+        scaler = fit_memmap_scaler(X, train_index)
+        run_key = dataset_content_hash(dataset_path)[:32]
+    else:
+        # Load the dataset, split it and normalize the features, or reuse
+        # the memory-mapped results of an earlier run on the same dataset
+        preprocessed = preprocess_dataset(
+            dataset_path, cache_dir='/content/drive/MyDrive/Project_ADHD/'
+                                    'preprocessing_cache',
+            test_size=0.2, random_state=42)
+        X_train_scaled = preprocessed['X_train']
+        X_test_scaled = preprocessed['X_test']
+        y_train = preprocessed['y_train']
+        y_test = preprocessed['y_test']
+        scaler = preprocessed['scaler']
+        run_key = preprocessed['cache_key']
+
+    # Keep the checkpoints of every dataset and split apart, so a run on
+    # other data never resumes them
+    checkpoint_dir = os.path.join(checkpoint_dir, run_key)
+
+    # Use deterministic hidden probabilities as RBM features
+    mean_field_features = True
+
+    # Reuse RBM features of identical RBM weights and inputs across runs.
+    # Only the final and comparison extraction use it: every grid-search
+    # trial trains a new RBM, so its features would only be written and
+    # evicted
+    feature_store = FeatureStore('/content/rbm_feature_store',
+                                 max_bytes=4 * 1024 ** 3)
+
+    # Early stopping: epochs without improvement before the RBM (training
+    # reconstruction error) or the FNN (held-out loss) stops training
+    rbm_patience = 2
+    fnn_patience = 3
+
+    # Processes training the final RBM and FNNs data-parallel over gloo, or
+    # 1 to train them in this process; data-parallel training uses global
+    # batches of 1024 rows (see train_rbm_data_parallel)
+    data_parallel_workers = 1
+
+    # Grid search over different n_hidden values with K-Fold Cross-Validation
+    n_hidden_values = [32, 64, 128, 256, 512]
+    num_workers = 1  # Processes running (n_hidden, fold) trials in parallel
+    stacked_fnn_training = False  # Train all fold FNNs as one batched model
+    if memmap_training:
+        val_accuracies, grid_trials = run_grid_search(
+            X, y, n_hidden_values, n_splits=5, num_workers=num_workers,
+            mean_field_features=mean_field_features, scaler=scaler,
+            index=train_index,
+            checkpoint_dir=os.path.join(checkpoint_dir, 'grid_search'),
+            rbm_patience=rbm_patience, fnn_patience=fnn_patience)
+    elif stacked_fnn_training:
+        val_accuracies = run_stacked_grid_search(
+            X_train_scaled, y_train, n_hidden_values, n_splits=5,
+            mean_field_features=mean_field_features)
+    else:
+        val_accuracies, grid_trials = run_grid_search(
+            X_train_scaled, y_train, n_hidden_values, n_splits=5,
+            num_workers=num_workers,
+            mean_field_features=mean_field_features,
+            checkpoint_dir=os.path.join(checkpoint_dir, 'grid_search'),
+            rbm_patience=rbm_patience, fnn_patience=fnn_patience)
+
+    # Average validation accuracies for each n_hidden value
+    avg_val_accuracies = {n_hidden: np.mean(accs) for n_hidden, accs in
+                          val_accuracies.items()}
+
+    # Plotting the results
+    n_hidden_list = list(avg_val_accuracies.keys())
+    avg_val_acc_list = list(avg_val_accuracies.values())
+
+    plt.plot(n_hidden_list, avg_val_acc_list, marker='o')
+    plt.xlabel('Number of Hidden Units (n_hidden)')
+    plt.ylabel('Average Validation Accuracy')
+    plt.title('Average Validation Accuracy vs. Number of Hidden Units in RBM')
+    plt.grid(True)
+    plt.show()
+
+    # Find the optimal n_hidden value
+    optimal_n_hidden = max(avg_val_accuracies, key=avg_val_accuracies.get)
+    print(f'Optimal n_hidden value: {optimal_n_hidden}')
+
+    # Training rows as read by the data-parallel processes
+    if memmap_training:
+        X_rows, y_rows, train_rows, rows_scaler = X, y, train_index, scaler
+    else:
+        X_rows, y_rows = X_train_scaled, y_train
+        train_rows, rows_scaler = np.arange(len(y_train)), None
+
+    # Hold out part of the training rows to early-stop the final FNNs on
+    fit_rows, stop_rows = train_test_split(
+        np.arange(len(train_rows)), test_size=0.1, random_state=42,
+        stratify=y_rows[train_rows])
+
+    # Final training on the full training set with the optimal n_hidden
+    rbm = RBM(n_visible=scaler.n_features_in_, n_hidden=optimal_n_hidden)
+    rbm_checkpoint = os.path.join(checkpoint_dir, 'rbm.pt')
+    if data_parallel_workers > 1:
+        train_rbm_data_parallel(rbm, X_rows, data_parallel_workers,
+                                index=train_rows, scaler=rows_scaler,
+                                epochs=10, checkpoint_path=rbm_checkpoint,
+                                patience=rbm_patience, verbose=True)
+    elif memmap_training:
+        rbm.train(MemmapBatchLoader(X, y, train_index, batch_size=10,
+                                    scaler=scaler), epochs=10,
+                  checkpoint_path=rbm_checkpoint, patience=rbm_patience,
+                  verbose=True)
+    else:
+        rbm.train(torch.from_numpy(X_train_scaled).float(), epochs=10,
+                  checkpoint_path=rbm_checkpoint, patience=rbm_patience,
+                  verbose=True)
+
+    if memmap_training:
+        transform = rbm_feature_transform(rbm, mean_field_features)
+        train_loader_rbm = MemmapBatchLoader(X, y, train_index[fit_rows],
+                                             scaler=scaler,
+                                             transform=transform)
+        stop_data_rbm = (MemmapBatchLoader(
+            X, y, train_index[stop_rows], batch_size=65536, shuffle=False,
+            scaler=scaler, transform=transform),)
+        X_test_rbm = MemmapBatchLoader(X, y, test_index, batch_size=65536,
+                                       shuffle=False, scaler=scaler,
+                                       transform=transform)
+        y_test = None
+    else:
+        X_test_rbm = feature_store.extract(X_test_scaled, rbm,
+                                           mean_field_features)
+        if data_parallel_workers <= 1:
+            X_train_rbm = feature_store.extract(X_train_scaled, rbm,
+                                                mean_field_features)
+            train_loader_rbm = prepare_dataloader(X_train_rbm[fit_rows],
+                                                  y_train[fit_rows])
+            stop_data_rbm = (X_train_rbm[stop_rows], y_train[stop_rows])
+
+    fnn = FNN(input_dim=optimal_n_hidden)
+    fnn_checkpoint = os.path.join(checkpoint_dir, 'fnn.pt')
+    if data_parallel_workers > 1:
+        # The processes compute the RBM features of their rows per batch
+        train_fnn_data_parallel(
+            fnn, X_rows, y_rows, data_parallel_workers,
+            index=train_rows[fit_rows], val_index=train_rows[stop_rows],
+            scaler=rows_scaler, rbm=rbm, mean_field=mean_field_features,
+            num_epochs=10, checkpoint_path=fnn_checkpoint,
+            patience=fnn_patience, verbose=True)
+    else:
+        criterion = nn.BCELoss()
+        optimizer = optim.Adam(fnn.parameters(), lr=0.001)
+        train_fnn(fnn, criterion, optimizer, train_loader_rbm, num_epochs=10,
+                  checkpoint_path=fnn_checkpoint, val_data=stop_data_rbm,
+                  patience=fnn_patience, verbose=True)
+
+    # Save the trained models and scaler
+    torch.save(rbm.state_dict(), os.path.join(output_dir, 'rbm_model.pth'))
+    torch.save(fnn.state_dict(), os.path.join(output_dir, 'fnn_model.pth'))
+    joblib.dump(scaler, os.path.join(output_dir, 'scaler.pkl'))
+
+    # The final models are saved, so their checkpoints are no longer needed
+    for path in [rbm_checkpoint, fnn_checkpoint]:
+        os.remove(path)
+
+    # Record the RBM feature mode so the prediction app extracts the same
+    # features the FNN was trained on
+    with open(os.path.join(output_dir, 'feature_mode.json'), 'w') as f:
+        json.dump({'mean_field': mean_field_features}, f)
+
+    print("Models and scaler saved successfully!")
+
+    # Evaluate on the test set
+    test_report = evaluate_model(fnn, X_test_rbm, y_test)
+    print_report(test_report, f"Test Results with Optimal n_hidden = "
+                              f"{optimal_n_hidden}:")
+
+    # Plot ROC curve
+    plt.figure()
+    plt.plot(test_report['fpr'], test_report['tpr'], color='darkorange',
+             lw=2, label='ROC curve (area = %0.2f)' % test_report['auc'])
+    plt.plot([0, 1], [0, 1], color='navy', lw=2, linestyle='--')
+    plt.xlim([0.0, 1.0])
+    plt.ylim([0.0, 1.05])
+    plt.xlabel('False Positive Rate')
+    plt.ylabel('True Positive Rate')
+    plt.title('Receiver Operating Characteristic')
+    plt.legend(loc="lower right")
+    plt.show()
+
+    # Plot confusion matrix
+    disp = ConfusionMatrixDisplay(
+        confusion_matrix=test_report['confusion_matrix'])
+    disp.plot(cmap=plt.cm.Blues)
+    plt.title('Confusion Matrix')
+    plt.show()
+
+    # Compare the performance of models with RBM features and original features
+    print("\nEvaluating on original features for comparison:")
+
+    # Prepare original data for PyTorch
+    if memmap_training:
+        train_loader_orig = MemmapBatchLoader(X, y, train_index[fit_rows],
+                                              scaler=scaler)
+        stop_data_orig = (MemmapBatchLoader(
+            X, y, train_index[stop_rows], batch_size=65536, shuffle=False,
+            scaler=scaler),)
+        X_test_scaled = MemmapBatchLoader(X, y, test_index,
+                                          batch_size=65536, shuffle=False,
+                                          scaler=scaler)
+    elif data_parallel_workers <= 1:
+        train_loader_orig = prepare_dataloader(X_train_scaled[fit_rows],
+                                               y_train[fit_rows])
+        stop_data_orig = (X_train_scaled[stop_rows], y_train[stop_rows])
+
+    # Train FNN on original features
+    fnn_orig = FNN(input_dim=scaler.n_features_in_)
+    fnn_orig_checkpoint = os.path.join(checkpoint_dir, 'fnn_orig.pt')
+    if data_parallel_workers > 1:
+        train_fnn_data_parallel(
+            fnn_orig, X_rows, y_rows, data_parallel_workers,
+            index=train_rows[fit_rows], val_index=train_rows[stop_rows],
+            scaler=rows_scaler, num_epochs=10,
+            checkpoint_path=fnn_orig_checkpoint, patience=fnn_patience,
+            verbose=True)
+    else:
+        criterion = nn.BCELoss()
+        optimizer = optim.Adam(fnn_orig.parameters(), lr=0.001)
+        train_fnn(fnn_orig, criterion, optimizer, train_loader_orig,
+                  num_epochs=10, checkpoint_path=fnn_orig_checkpoint,
+                  val_data=stop_data_orig, patience=fnn_patience,
+                  verbose=True)
+    os.remove(fnn_orig_checkpoint)
+
+    # Evaluate on the test set with original features
+    test_report_orig = evaluate_model(fnn_orig, X_test_scaled, y_test)
+    print_report(test_report_orig, "Test Results with Original Features:")
+
+    # Compare the performance of models with RBM features and original features
+    if test_report['accuracy'] > test_report_orig['accuracy']:
+        print("RBM generated features improve the performance of the model.")
+    else:
+        print("RBM generated features do not improve the performance of the "
+              "model.")
+
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,8 @@ Original file is located at
 
 !pip install flask torch pandas scikit-learn pyngrok
 
+import json
+import os
 import torch
 import torch.nn as nn
 import joblib
@@ -107,10 +109,22 @@ fnn.load_state_dict(fnn_state_dict)
 # Load the scaler used during training
 scaler = joblib.load('/content/drive/MyDrive/Project_ADHD/scaler.pkl')
 
+# Use the feature mode the models were trained with (written by part 2);
+# models saved without it were trained on sampled Bernoulli features
+MEAN_FIELD_FEATURES = False
+feature_mode_path = '/content/drive/MyDrive/Project_ADHD/feature_mode.json'
+if os.path.exists(feature_mode_path):
+    with open(feature_mode_path) as f:
+        MEAN_FIELD_FEATURES = json.load(f)['mean_field']
+
 # Define a function to extract features
-def extract_features(v_data, rbm):
-    h_prob = rbm.sample_h_given_v(torch.from_numpy(v_data).float())
-    return h_prob.detach().numpy()
+def extract_features(v_data, rbm, mean_field=MEAN_FIELD_FEATURES):
+    with torch.inference_mode():
+        v = torch.from_numpy(v_data).float()
+        h_prob = torch.sigmoid(torch.matmul(v, rbm.W) + rbm.h_bias)
+        if not mean_field:
+            h_prob = torch.bernoulli(h_prob)
+    return h_prob.numpy()
 
 # Initialize Flask app
 app = Flask(__name__)
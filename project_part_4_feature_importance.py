@@ -10,21 +10,21 @@ Original file is located at
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
 from sklearn.ensemble import RandomForestClassifier
+from project_part_1_dataset import (load_dataset, preprocess_dataset,
+                                    split_and_scale)
 
 def load_data(filepath):
     """
-    Load the dataset from an Excel file.
+    Load the dataset from a binary dataset directory or an Excel file.
 
     Parameters:
-    filepath (str): The path to the Excel file.
+    filepath (str): The path to the dataset directory or Excel file.
 
     Returns:
     pd.DataFrame: The loaded dataset.
     """
-    return pd.read_excel(filepath)
+    return load_dataset(filepath)
 
 def preprocess_data(data):
     """
@@ -36,20 +36,11 @@ def preprocess_data(data):
     Returns:
     tuple: Scaled training and test features, training and test target variables.
     """
-    # Separate features and target variable
-    X = data.drop('is_adhd', axis=1)  # Features
-    y = data['is_adhd']  # Target variable
-
-    # Initial train/test split
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y)
-
-    # Normalize numerical features
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
-
-    return X_train_scaled, X_test_scaled, y_train, y_test
+    # Stratified split and scaling shared with part 2
+    result = split_and_scale(data, test_size=0.2, random_state=42)
+    y = data['is_adhd']
+    return (result['X_train'], result['X_test'],
+            y.iloc[result['train_index']], y.iloc[result['test_index']])
 
 def train_random_forest(X_train, y_train):
     """
@@ -57,7 +48,7 @@ def train_random_forest(X_train, y_train):
 
     Parameters:
     X_train (np.array): Scaled training features.
-    y_train (pd.Series): Training target variable.
+    y_train (np.array or pd.Series): Training target variable.
 
     Returns:
     RandomForestClassifier: The trained Random Forest model.
@@ -108,18 +99,19 @@ def main():
     Main function to load data, preprocess, train the model, and plot feature
     importance.
     """
-    # Load the dataset
-    filepath = '/content/drive/MyDrive/Project_ADHD/student_data_ADHD.xlsx'
-    data = load_data(filepath)
-
-    # Preprocess the data
-    X_train_scaled, X_test_scaled, y_train, y_test = preprocess_data(data)
+    # Load and preprocess the dataset, reusing the split and scaler cached
+    # by an earlier run of this part or of part 2
+    filepath = '/content/drive/MyDrive/Project_ADHD/student_data_ADHD'
+    preprocessed = preprocess_dataset(
+        filepath, cache_dir='/content/drive/MyDrive/Project_ADHD/'
+                            'preprocessing_cache')
 
     # Train a Random Forest model
-    rf = train_random_forest(X_train_scaled, y_train)
+    rf = train_random_forest(preprocessed['X_train'],
+                             preprocessed['y_train'])
 
     # Plot feature importance
-    plot_feature_importance(rf, data.columns.drop('is_adhd'))
+    plot_feature_importance(rf, pd.Index(preprocessed['feature_names']))
 
 if __name__ == '__main__':
     main()
\ No newline at end of file